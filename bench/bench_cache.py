@@ -0,0 +1,33 @@
+# Compile cache benchmark: Lexer construction for a large spec without a cache,
+# on a cold cache (compile and store) and on a warm one (load only).
+#
+#   python3.12 -m bench.bench_cache [rules]
+
+import sys
+import tempfile
+import time
+
+from bench.bench_compile import make_spec
+from src.Lexer import Lexer
+
+
+def main() -> None:
+    n_rules = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    spec = make_spec(n_rules)
+    print(f"{'mode':>9} {'uncached s':>11} {'cold s':>8} {'warm s':>8}")
+    for mode in ('rules', 'combined', 'lazy'):
+        start = time.perf_counter()
+        Lexer(spec, mode)
+        uncached = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            Lexer(spec, mode, cache_dir=directory)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            Lexer(spec, mode, cache_dir=directory)
+            warm = time.perf_counter() - start
+        print(f"{mode:>9} {uncached:>11.3f} {cold:>8.3f} {warm:>8.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# Compile-once benchmark: lex time should scale with the input length only,
+# while the (spec size x token count) compile work happens once in Lexer.__init__.
+# In 'combined' mode the time per token should also not depend on the number of rules.
+#
+#   python3.12 -m bench.bench_compile
+
+import random
+import time
+
+from src.Lexer import Lexer
+
+
+def make_spec(n_rules: int) -> list[tuple[str, str]]:
+    spec = [("SPACE", "\\ "), ("NUMBER", "[0-9]+"), ("NAME", "[a-z]+")]
+    for k in range(n_rules - len(spec)):
+        spec.insert(0, (f"KW{k}", f"kw{k}"))
+    return spec
+
+
+def make_input(n_tokens: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = []
+    for _ in range(n_tokens):
+        if rng.random() < 0.5:
+            words.append(''.join(rng.choice('abcdefgh') for _ in range(rng.randint(1, 8))))
+        else:
+            words.append(str(rng.randint(0, 10 ** 6)))
+    return ' '.join(words)
+
+
+def measure(mode: str, n_rules: int, n_tokens: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    lexer = Lexer(make_spec(n_rules), mode)
+    compiled = time.perf_counter()
+    lexer.lex(make_input(n_tokens))
+    done = time.perf_counter()
+    return compiled - start, done - compiled
+
+
+def main() -> None:
+    print(f"{'mode':>9} {'rules':>6} {'tokens':>8} {'compile s':>10} {'lex s':>8} {'us/token':>9}")
+    for mode in ('rules', 'combined'):
+        for n_rules in (5, 20, 80, 160):
+            for n_tokens in (1_000, 10_000, 50_000):
+                compile_time, lex_time = measure(mode, n_rules, n_tokens)
+                # lex emits a SPACE token between every two words
+                per_token = lex_time / (2 * n_tokens - 1) * 1e6
+                print(f"{mode:>9} {n_rules:>6} {n_tokens:>8} {compile_time:>10.3f} {lex_time:>8.3f} {per_token:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
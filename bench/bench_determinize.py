@@ -0,0 +1,43 @@
+# Determinization benchmark on regexes with deeply nested '*' and '?', whose
+# Thompson NFAs are dominated by epsilon transitions. Compares the frozenset
+# subset construction with the bitset one.
+#
+#   python3.12 -m bench.bench_determinize
+
+import time
+
+from src.Regex import parse_regex
+
+
+def nested(depth: int) -> str:
+    regex = 'a'
+    for level in range(depth):
+        regex = f"({regex}{'b' if level % 2 else 'c'}?)*"
+    return regex
+
+
+REGEXES = {
+    'nested 8': nested(8),
+    'nested 16': nested(16),
+    'nested 32': nested(32),
+    'optional chain': '(a?b?c?d?e?f?g?h?)*(ab|cd|ef|gh)+',
+    'identifiers': '([a-z]|_)([a-z]|[0-9]|_)*',
+    'keywords': '|'.join(f'kw{k}' for k in range(200)),
+}
+
+
+def main() -> None:
+    print(f"{'regex':>15} {'nfa states':>11} {'dfa states':>11} {'frozenset s':>12} {'bitset s':>9}")
+    for name, regex in REGEXES.items():
+        nfa = parse_regex(regex).thompson()
+        nfa.closure_table()
+        start = time.perf_counter()
+        dfa = nfa.subset_construction()
+        middle = time.perf_counter()
+        nfa.subset_construction_bitset()
+        done = time.perf_counter()
+        print(f"{name:>15} {len(nfa.K):>11} {len(dfa.K):>11} {middle - start:>12.4f} {done - middle:>9.4f}")
+
+
+if __name__ == '__main__':
+    main()
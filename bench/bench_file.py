@@ -0,0 +1,37 @@
+# Memory-mapped lexing benchmark: lex_file on a generated file compared with
+# reading the same file into a str and calling lex.
+#
+#   python3.12 -m bench.bench_file [megabytes]
+
+import os
+import sys
+import tempfile
+import time
+
+from bench.bench_compile import make_input, make_spec
+from src.Lexer import Lexer
+
+
+def main() -> None:
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    lexer = Lexer(make_spec(20))
+    text = make_input(int(megabytes * 1e6 / 6))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'input.txt')
+        with open(path, 'w') as f:
+            f.write(text)
+        lexer.byte_automata
+
+        start = time.perf_counter()
+        with open(path) as f:
+            tokens = lexer.lex(f.read())
+        print(f"read + lex: {time.perf_counter() - start:.3f} s, {len(tokens)} tokens")
+
+        start = time.perf_counter()
+        spans = lexer.lex_file(path)
+        print(f"lex_file:   {time.perf_counter() - start:.3f} s, {len(spans)} spans")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# Direct DFA benchmark: the followpos construction against Thompson's NFA and the
+# subset construction (set and bitset versions), on the suite's specs and on
+# keyword-heavy specs, whose literal rules make the Thompson NFA long and thin.
+# Each time covers everything from the parsed rules to the unminimized DFA.
+#
+#   python3.12 -m bench.bench_followpos
+
+import time
+
+from bench.bench_compile import make_spec
+from bench.specs import SPECS
+from src.Alphabet import partition
+from src.Followpos import followpos_dfa
+from src.Lexer import union
+from src.Regex import Regex, parse_regex
+
+
+def subset(regexes: list[Regex], symbols: set[str]) -> int:
+    nfa, _ = union([regex.thompson() for regex in regexes])
+    return len(nfa.subset_construction().K)
+
+
+def subset_bitset(regexes: list[Regex], symbols: set[str]) -> int:
+    nfa, _ = union([regex.thompson() for regex in regexes])
+    return len(nfa.subset_construction_bitset()[0].K)
+
+
+def followpos(regexes: list[Regex], symbols: set[str]) -> int:
+    return len(followpos_dfa(regexes, symbols)[0].K)
+
+
+BUILDERS = {'subset': subset, 'subset bitset': subset_bitset, 'followpos': followpos}
+
+
+def main() -> None:
+    cases = {f"spec {name}": spec for name, spec in SPECS.items()}
+    cases.update({f"{n} keywords": make_spec(n) for n in (50, 200)})
+    print(f"{'case':>16} {'construction':>14} {'dfa states':>11} {'time s':>8}")
+    for name, spec in cases.items():
+        regexes = [parse_regex(regex) for _, regex in spec]
+        symbols = set(partition(regexes).representative)
+        for construction, build in BUILDERS.items():
+            start = time.perf_counter()
+            states = build(regexes, symbols)
+            spent = time.perf_counter() - start
+            print(f"{name:>16} {construction:>14} {states:>11} {spent:>8.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# NFA construction benchmark: Thompson's construction against the epsilon-free
+# Glushkov (position) automaton, on the determinization benchmark's regexes and the
+# suite's specs. Times building the NFA and the bitset subset construction of it.
+#
+#   python3.12 -m bench.bench_glushkov
+
+import time
+
+from bench.bench_determinize import REGEXES
+from bench.specs import SPECS
+from src.Glushkov import glushkov
+from src.Lexer import union
+from src.Regex import Regex, parse_regex
+
+CONSTRUCTIONS = {'thompson': Regex.thompson, 'glushkov': glushkov}
+
+
+def measure(construct, regexes: list[Regex]) -> tuple[int, float, float]:
+    start = time.perf_counter()
+    nfas = [construct(regex) for regex in regexes]
+    nfa = nfas[0] if len(nfas) == 1 else union(nfas)[0]
+    middle = time.perf_counter()
+    nfa.subset_construction_bitset()
+    done = time.perf_counter()
+    return len(nfa.K), middle - start, done - middle
+
+
+def main() -> None:
+    cases = {name: [parse_regex(regex)] for name, regex in REGEXES.items()}
+    cases.update({f"spec {name}": [parse_regex(regex) for _, regex in spec] for name, spec in SPECS.items()})
+    print(f"{'case':>20} {'construction':>13} {'nfa states':>11} {'build s':>8} {'determinize s':>14}")
+    for name, regexes in cases.items():
+        for construction, construct in CONSTRUCTIONS.items():
+            states, build, determinize = measure(construct, regexes)
+            print(f"{name:>20} {construction:>13} {states:>11} {build:>8.4f} {determinize:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# Minimization scaling benchmark: Hopcroft on random DFAs of 10^2..10^5 states.
+# Time per state should grow roughly like log n.
+#
+#   python3.12 -m bench.bench_minimize
+
+import math
+import random
+import time
+from array import array
+
+from src.DFA import CompiledDFA
+
+
+def random_dfa(n: int, width: int, seed: int = 0) -> CompiledDFA:
+    rng = random.Random(seed)
+    table = array('i', (rng.randrange(n) for _ in range(n * width)))
+    tags = array('i', (0 if rng.random() < 0.3 else -1 for _ in range(n)))
+    symbols = {chr(ord('a') + column): column for column in range(width)}
+    return CompiledDFA(symbols, table, 0, tags, tuple(range(n)))
+
+
+def chain_dfa(n: int) -> CompiledDFA:
+    # a^(n-1) counter with a single final state: already minimal, worst case for refinement
+    table = array('i', ((state + 1) % n for state in range(n)))
+    tags = array('i', [-1]) * n
+    tags[n - 1] = 0
+    return CompiledDFA({'a': 0}, table, 0, tags, tuple(range(n)))
+
+
+def main() -> None:
+    print(f"{'dfa':>8} {'states':>8} {'symbols':>8} {'minimal':>8} {'seconds':>9} {'us/(n log n)':>13}")
+    for n in (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5):
+        for name, dfa in (('random', random_dfa(n, 2)), ('random', random_dfa(n, 8)), ('chain', chain_dfa(n))):
+            start = time.perf_counter()
+            minimal = dfa.minimize()
+            elapsed = time.perf_counter() - start
+            width = len(dfa.symbols)
+            scaled = elapsed / (n * width * math.log2(n)) * 1e6
+            print(f"{name:>8} {n:>8} {width:>8} {len(minimal.states):>8} {elapsed:>9.3f} {scaled:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# Parallel lexing benchmark: lex_parallel with a growing number of worker
+# processes against a single sequential lex of the same text.
+#
+#   python3.12 -m bench.bench_parallel [megabytes] [max workers]
+
+import os
+import sys
+import time
+
+from bench.bench_compile import make_input, make_spec
+from src.Lexer import Lexer
+
+
+def main() -> None:
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    lexer = Lexer(make_spec(20))
+    text = make_input(int(megabytes * 1e6 / 6))
+
+    start = time.perf_counter()
+    expected = lexer.lex(text)
+    sequential = time.perf_counter() - start
+    print(f"{'workers':>8} {'seconds':>8} {'speedup':>8}")
+    print(f"{1:>8} {sequential:>8.3f} {1:>8.2f}")
+
+    workers = 2
+    while workers <= max_workers:
+        start = time.perf_counter()
+        tokens = lexer.lex_parallel(text, workers)
+        elapsed = time.perf_counter() - start
+        assert tokens == expected
+        print(f"{workers:>8} {elapsed:>8.3f} {sequential / elapsed:>8.2f}")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# Streaming benchmark: lex_stream over a large generated input, compared with
+# lex on the same text held in memory.
+#
+#   python3.12 -m bench.bench_stream
+
+import io
+import time
+import tracemalloc
+
+from bench.bench_compile import make_input, make_spec
+from src.Lexer import Lexer
+
+
+def main() -> None:
+    lexer = Lexer(make_spec(20))
+    text = make_input(200_000)
+    print(f"input: {len(text) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    expected = lexer.lex(text)
+    print(f"lex:        {time.perf_counter() - start:.3f} s, {len(expected)} tokens")
+
+    for chunk_size in (1 << 10, 1 << 16):
+        start = time.perf_counter()
+        count = sum(1 for _ in lexer.lex_stream(io.StringIO(text), chunk_size))
+        elapsed = time.perf_counter() - start
+
+        # Separate pass, tracemalloc slows allocation down considerably. The chunks are
+        # sliced on demand, as StringIO would show up with its own copy of the text.
+        chunks = (text[k:k + chunk_size] for k in range(0, len(text), chunk_size))
+        tracemalloc.start()
+        for _ in lexer.lex_stream(chunks):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"lex_stream: {elapsed:.3f} s, {count} tokens, chunk {chunk_size}, peak {peak / 1024:.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
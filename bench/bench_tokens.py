@@ -0,0 +1,35 @@
+# Token storage benchmark: memory held by the result of lex (a list of tuples)
+# compared with lex_buffer (a TokenBuffer), on the same input.
+#
+#   python3.12 -m bench.bench_tokens [megabytes]
+
+import sys
+import time
+import tracemalloc
+
+from bench.bench_compile import make_input, make_spec
+from src.Lexer import Lexer
+
+
+def measure(lex, text: str) -> tuple[float, int, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    tokens = lex(text)
+    elapsed = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, held, len(tokens)
+
+
+def main() -> None:
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    lexer = Lexer(make_spec(20))
+    text = make_input(int(megabytes * 1e6 / 6))
+
+    for name, lex in (('lex', lexer.lex), ('lex_buffer', lexer.lex_buffer)):
+        elapsed, held, count = measure(lex, text)
+        print(f"{name:>10}: {elapsed:.3f} s, {count} tokens, {held / 1e6:.1f} MB held, {held / count:.1f} B/token")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+# Compile phase breakdown: the seconds a Tracer attributes to each phase of
+# Lexer(spec) for the suite's specs, and the time taken with and without it.
+#
+#   python3.12 -m bench.bench_trace [chrome trace output path]
+
+import sys
+import time
+
+from bench.specs import SPECS
+from src.Lexer import MODES, Lexer
+from src.Trace import Tracer
+
+
+def main() -> None:
+    for mode in MODES:
+        tracer = Tracer()
+        untraced = traced = 0.0
+        for spec in SPECS.values():
+            start = time.perf_counter()
+            Lexer(spec, mode)
+            untraced += time.perf_counter() - start
+            start = time.perf_counter()
+            Lexer(spec, mode, tracer=tracer)
+            traced += time.perf_counter() - start
+
+        print(f"{mode}: {untraced:.3f} s untraced, {traced:.3f} s traced")
+        for phase, seconds in sorted(tracer.totals().items(), key=lambda item: -item[1]):
+            print(f"  {phase:>20} {seconds:>8.4f} s")
+        if len(sys.argv) > 1:
+            tracer.dump(f"{sys.argv[1]}.{mode}.json", 'chrome')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# Workloads of the benchmark suite: the "big" specs of test/test_hw_3.py, a
+# programming-language spec, and inputs of any size generated from them.
+
+import random
+from collections import deque
+
+from src.DFA import CompiledDFA
+from src.Lexer import Lexer
+
+
+SPECS: dict[str, list[tuple[str, str]]] = {
+    # test_8_big
+    'hw3_8': [
+        ("SPACE", "\\ "),
+        ("DS", "d+"),
+        ("ABS", "(ab)*"),
+        ("ABC", "abc"),
+        ("APLUSBCD", "(a+)bcd"),
+        ("BORCS", "(b|c)*"),
+        ("BCSD", "(bc)*d"),
+        ("DSTARACS", "d*(ac)+"),
+    ],
+    # test_9_big
+    'hw3_9': [
+        ("SPACE", "\\ "),
+        ("TOKEN1", "(a|b)+(c|d)e"),
+        ("TOKEN2", "(ab)*((cd*)|e)"),
+        ("TOKEN3", "b+d*(e|a)*"),
+        ("TOKEN4", "((ed)|(bc))+"),
+        ("TOKEN5", "(b|c)*((da)|(ae))+"),
+    ],
+    # test_10_big
+    'hw3_10': [
+        ("SPACE", "\\ "),
+        ("ABSTAR", "(ab)*"),
+        ("ABPLUSC", "(ab)+c*"),
+        ("BCBC", "bcbc"),
+        ("CBSAR", "(cb)*"),
+        ("BORCS", "(b|c)*"),
+        ("ABDORE", "(abd)|e"),
+        ("ASTARBD", "a*bd"),
+        ("EFSTAR", "ef*"),
+        ("C", "c"),
+    ],
+    # test_12_big
+    'hw3_12': [
+        ("SPACE", "\\ "),
+        ("NEWLINE", "\n"),
+        ("PATTERN1", "((b+|e)(a*|b+))+((e+fd)*|(c+a*)*)"),
+        ("PATTERN2", "(((db)|d+)*(da)*(dc)*)|((dc)+|(a+|b+))*"),
+        ("PATTERN3", "((e|(db))+|(e+e(e|f*)))+"),
+        ("PATTERN4", "(((f*a+)|(a*d+))|((a*|e)daf+))+"),
+        ("PATTERN5", "(((c|d)|f*)*|((f|a)+|(b|c)+))+"),
+    ],
+    # A small Python-like language: keywords before identifiers, so ties go to them
+    'language': [
+        *((keyword.upper(), keyword) for keyword in (
+            "def", "class", "return", "if", "elif", "else", "while", "for", "in",
+            "import", "from", "as", "not", "and", "or", "None", "True", "False",
+        )),
+        ("NAME", "[a-zA-Z_][a-zA-Z0-9_]*"),
+        ("NUMBER", "[0-9]+(.[0-9]+)?"),
+        ("STRING", "\"[a-zA-Z0-9_,.:+=<>()# -]*\""),
+        ("COMMENT", "#[a-zA-Z0-9_,.:+=<>()\" -]*\n"),
+        ("OPERATOR", "==|!=|<=|>=|\\+=|-=|\\+|-|\\*|/|%|<|>|="),
+        ("PUNCTUATION", "\\(|\\)|\\[|\\]|{|}|,|:|."),
+        ("NEWLINE", "\n"),
+        ("SPACE", "\\ +"),
+    ],
+}
+
+# Token separators of each spec, placed after every generated lexeme
+SEPARATORS = {'hw3_12': (" ", "\n"), 'language': (" ", "\n")}
+
+
+def sample(dfa: CompiledDFA, rng: random.Random, length: int) -> str:
+    # A random non-empty word of a trimmed DFA, of about `length` characters: a random
+    # walk, which heads to the closest final state once the length is reached
+    width = dfa.width
+    chars: dict[int, list[str]] = {}
+    for char, column in sorted(dfa.symbols.items()):
+        chars.setdefault(column, []).append(char)
+
+    # distance from each state to a final state, over reversed transitions
+    distance = [0 if tag >= 0 else -1 for tag in dfa.tags]
+    queue = deque(state for state, tag in enumerate(dfa.tags) if tag >= 0)
+    while queue:
+        target = queue.popleft()
+        for state in range(len(dfa.tags)):
+            if distance[state] < 0 and target in dfa.table[state * width:(state + 1) * width]:
+                distance[state] = distance[target] + 1
+                queue.append(state)
+
+    word = []
+    state = dfa.q0
+    while True:
+        moves = [(column, target) for column, target in enumerate(dfa.table[state * width:(state + 1) * width])
+                 if target >= 0 and column in chars]
+        if word and dfa.tags[state] >= 0 and (len(word) >= length or not moves or rng.random() < 0.2):
+            return ''.join(word)
+        if len(word) >= length:
+            moves = [move for move in moves if distance[move[1]] < distance[state] or distance[state] == 0]
+        column, state = rng.choice(moves)
+        word.append(rng.choice(chars[column]))
+
+
+def corpus(name: str, size: int = 1 << 16, seed: int = 0) -> list[str]:
+    # Fragments of about `size` characters in total, each a sampled token followed by
+    # a separator, kept only if the fragment lexes on its own
+    spec = SPECS[name]
+    separators = SEPARATORS.get(name, (" ",))
+    rules = Lexer(spec, 'rules').compiled.automata
+    lexer = Lexer(spec)
+    rng = random.Random(seed)
+
+    fragments = []
+    total = 0
+    while total < size:
+        rule = rng.randrange(len(spec))
+        fragment = sample(rules[rule], rng, rng.randint(1, 12)) + rng.choice(separators)
+        # an error is a single token with an empty name
+        if lexer.lex(fragment)[0][0]:
+            fragments.append(fragment)
+            total += len(fragment)
+    return fragments
+
+
+def make_text(name: str, size: int, seed: int = 0) -> str:
+    # At least `size` characters of input for spec `name`: its corpus repeated, then
+    # as many of its fragments as needed, so that no token is cut
+    fragments = corpus(name, min(size, 1 << 16), seed)
+    text = ''.join(fragments)
+    parts = [text * (size // len(text))]
+    length = len(parts[0])
+    for fragment in fragments:
+        if length >= size:
+            break
+        parts.append(fragment)
+        length += len(fragment)
+    return ''.join(parts)
@@ -0,0 +1,135 @@
+# Lexer throughput suite: every spec of bench/specs.py, in every mode, on inputs
+# of several sizes. Each case runs in its own process, so that its peak RSS is its
+# own. Reports tokens/s, MB/s and peak RSS, writes the results as JSON and, given
+# a baseline written by an earlier run, flags the cases that got slower (or bigger)
+# by more than the threshold; the exit status is then 1.
+#
+#   python3.12 -m bench.suite [--sizes 1K,64K,1M,100M] [--modes ...] [--specs ...]
+#                             [--output results.json] [--baseline baseline.json]
+#                             [--threshold 0.1] [--repeat 3]
+#
+# bench/baseline.json holds a run with the default sizes on the reference machine.
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from bench.specs import SPECS, make_text
+from src.Lexer import MODES, Lexer
+
+
+UNITS = {'K': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9}
+
+
+def parse_size(text: str) -> int:
+    if text[-1].upper() in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1].upper()])
+    return int(text)
+
+
+def run_case(spec: str, mode: str, size: int, repeat: int) -> dict:
+    # Measure one case in this process, keeping the best of `repeat` runs
+    text = make_text(spec, size)
+    start = time.perf_counter()
+    lexer = Lexer(SPECS[spec], mode)
+    compiled = time.perf_counter()
+    seconds = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        tokens = lexer.lex(text)
+        seconds = min(seconds, time.perf_counter() - begin)
+    if not tokens[0][0]:
+        raise RuntimeError(f"{spec}: the generated input does not lex: {tokens[0][1]}")
+
+    encoded = len(text.encode('utf-8'))
+    return {
+        'spec': spec,
+        'mode': mode,
+        'bytes': encoded,
+        'tokens': len(tokens),
+        'compile_seconds': compiled - start,
+        'seconds': seconds,
+        'tokens_per_second': len(tokens) / seconds,
+        'mb_per_second': encoded / 1e6 / seconds,
+        # kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3,
+    }
+
+
+def key(result: dict) -> tuple[str, str, int]:
+    return result['spec'], result['mode'], result['size']
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    # Cases slower, or with a higher peak RSS, than the baseline by more than `threshold`
+    before = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        name = '/'.join(map(str, key(result)))
+        if result['tokens_per_second'] < old['tokens_per_second'] * (1 - threshold):
+            regressions.append(
+                f"{name}: {result['tokens_per_second']:.0f} tokens/s, was {old['tokens_per_second']:.0f}"
+            )
+        if result['peak_rss_mb'] > old['peak_rss_mb'] * (1 + threshold):
+            regressions.append(f"{name}: {result['peak_rss_mb']:.1f} MB peak RSS, was {old['peak_rss_mb']:.1f}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Lexer throughput suite: tokens/s, MB/s and peak RSS of every spec in every mode, "
+                    "compared with a baseline when one is given"
+    )
+    parser.add_argument('--sizes', default='1K,64K,1M', help="input sizes, e.g. 1K,64K,1M,100M")
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--specs', default=','.join(SPECS))
+    parser.add_argument('--output', help="where to write the results as JSON")
+    parser.add_argument('--baseline', help="results of an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.1, help="tolerated slowdown, as a fraction")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per case, the fastest is kept")
+    parser.add_argument('--case', nargs=3, metavar=('SPEC', 'MODE', 'SIZE'), help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.case:
+        spec, mode, size = arguments.case
+        print(json.dumps(run_case(spec, mode, int(size), arguments.repeat)))
+        return
+
+    results = []
+    print(f"{'spec':>9} {'mode':>9} {'size':>6} {'tokens':>9} {'tokens/s':>9} {'MB/s':>6} {'RSS MB':>7}")
+    for spec in arguments.specs.split(','):
+        for mode in arguments.modes.split(','):
+            for size in arguments.sizes.split(','):
+                command = [
+                    sys.executable, '-m', 'bench.suite', '--repeat', str(arguments.repeat),
+                    '--case', spec, mode, str(parse_size(size))
+                ]
+                output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output) | {'size': size}
+                results.append(result)
+                print(
+                    f"{spec:>9} {mode:>9} {size:>6} {result['tokens']:>9} {result['tokens_per_second']:>9.0f}"
+                    f" {result['mb_per_second']:>6.2f} {result['peak_rss_mb']:>7.1f}"
+                )
+
+    if arguments.output:
+        with open(arguments.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as f:
+            regressions = compare(results, json.load(f), arguments.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
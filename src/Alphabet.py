@@ -0,0 +1,63 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import FrozenSet
+
+from .Regex import Regex, Literal, CharacterClass, leaves, transform_leaves
+
+
+@dataclass(frozen=True)
+class Alphabet:
+    # The characters used by a set of regexes, split into classes of characters that
+    # no regex can tell apart. Each class is represented by its smallest character,
+    # so automata can be built over the representatives only.
+    classes: tuple[FrozenSet[str], ...]
+    # character -> representative of its class
+    representative: dict[str, str]
+
+    def compress(self, regex: Regex, memo: dict[Regex, Regex] | None = None) -> Regex:
+        # The same regex over representatives; it accepts w exactly when the original
+        # regex accepts some word with the same class at every position
+        def leaf(node: Regex) -> Regex:
+            if isinstance(node, Literal):
+                return Literal(self.representative[node.char])
+            if isinstance(node, CharacterClass):
+                return CharacterClass({self.representative[c] for c in node.chars})
+            return node
+        return transform_leaves(regex, leaf, memo)
+
+    def expand(self, symbols: dict[str, int]) -> dict[str, int]:
+        # Column table over representatives -> column table over every character
+        return {
+            char: symbols[representative]
+            for char, representative in self.representative.items()
+            if representative in symbols
+        }
+
+
+def partition(regexes: Iterable[Regex]) -> Alphabet:
+    # Two characters are equivalent when they belong to exactly the same literal and
+    # character-class leaves
+    sets: dict[FrozenSet[str], int] = {}
+    for regex in regexes:
+        for node in leaves(regex):
+            if isinstance(node, Literal):
+                sets.setdefault(frozenset((node.char,)), len(sets))
+            elif isinstance(node, CharacterClass):
+                sets.setdefault(frozenset(node.chars), len(sets))
+
+    membership: dict[str, list[int]] = {}
+    for chars, index in sets.items():
+        for char in chars:
+            membership.setdefault(char, []).append(index)
+
+    groups: dict[tuple[int, ...], list[str]] = {}
+    for char, indices in membership.items():
+        groups.setdefault(tuple(indices), []).append(char)
+
+    classes = tuple(frozenset(chars) for chars in groups.values())
+    representative = {}
+    for chars in classes:
+        smallest = min(chars)
+        for char in chars:
+            representative[char] = smallest
+    return Alphabet(classes, representative)
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from . import __version__
+
+
+# Start of every cache file, followed by the SHA-256 of the pickled payload
+MAGIC = b'LEXCACHE1\n'
+ENVIRONMENT = 'LEXER_CACHE_DIR'
+# Version of the pickled objects, part of every key: bumped whenever a class a
+# compiled spec pickles changes (2: hash-consed regex nodes, CharacterClass over a
+# frozenset; 3: DerivativeDFA automata; 4: both lazy automata on CachedDFA)
+FORMAT = 4
+
+
+def cache_key(*parts: object) -> str:
+    # Hash of everything a compiled spec depends on, the library version and the
+    # pickle format included, so that an upgrade never picks up tables built by
+    # older code
+    text = json.dumps([__version__, FORMAT, *parts], ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def cache_directory(directory: str | None = None) -> str | None:
+    # The directory given, else $LEXER_CACHE_DIR; None disables caching
+    return directory or os.environ.get(ENVIRONMENT) or None
+
+
+def cache_path(directory: str, key: str) -> str:
+    return os.path.join(directory, f'{key}.pickle')
+
+
+def load(directory: str, key: str) -> object | None:
+    # The object stored under `key`, or None if it is missing or fails validation.
+    # The directory must be trusted, as loading unpickles its content.
+    try:
+        with open(cache_path(directory, key), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    header = len(MAGIC) + hashlib.sha256().digest_size
+    if not data.startswith(MAGIC) or hashlib.sha256(data[header:]).digest() != data[len(MAGIC):header]:
+        return None
+    try:
+        stored_key, value = pickle.loads(data[header:])
+    except Exception:
+        return None
+    return value if stored_key == key else None
+
+
+def store(directory: str, key: str, value: object) -> None:
+    # Write `value` under `key` atomically: a reader sees either the old file or the
+    # complete new one. The cache is best-effort, so a failed write is ignored.
+    payload = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix=f'.{key}.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(MAGIC)
+                f.write(hashlib.sha256(payload).digest())
+                f.write(payload)
+            os.replace(temporary, cache_path(directory, key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    except OSError:
+        pass
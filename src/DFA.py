@@ -1,9 +1,16 @@
+from array import array
 from collections.abc import Callable
 from dataclasses import dataclass
-from typing import TypeVar, Dict, Tuple, Set, FrozenSet
+from functools import cached_property
+from typing import TypeVar
 
 STATE = TypeVar('STATE')
 
+# How the text format (see CompiledDFA.load) writes the symbols that would break its
+# lines; a space is written as a double backslash, as in the reference files
+ESCAPES = {'\n': '\\n', '\t': '\\t', ' ': '\\\\'}
+UNESCAPES = {text: symbol for symbol, text in ESCAPES.items()}
+
 @dataclass
 class DFA[STATE]:
     S: set[str]
@@ -22,87 +29,498 @@ class DFA[STATE]:
                 return False
         return current_state in self.F
 
-    def remap_states[OTHER_STATE](self, f: Callable[[STATE], 'OTHER_STATE']) -> 'DFA[OTHER_STATE]':
-        # Optional, for remapping states
-        pass
-
-    def reversed_delta(self, symbol: str, Q: set[STATE]) -> set[STATE]:
-        # Compute reverse delta (delta^-1) for a symbol and a set of states
-        X = set()
-        for (state, char), target in self.d.items():
-            if char == symbol and target in Q:
-                X.add(state)
-        return X
-
-    def split_partition(self, P: list[set[STATE]], W: list[set[STATE]], X: set[STATE]) -> None:
-        # Split partitions based on reverse delta
-        for R in list(P):  # Copy P to safely modify while iterating
-            R1 = R.intersection(X)
-            R2 = R - R1
-            if R1 and R2:  # If R can be split
-                P.remove(R)
-                P.append(R1)
-                P.append(R2)
-                if R in W:
-                    W.remove(R)
-                    W.append(R1)
-                    W.append(R2)
-                else:
-                    W.append(R1 if len(R1) <= len(R2) else R2)
+    def compile(self, tags: dict[STATE, int] | None = None) -> 'CompiledDFA[STATE]':
+        # Number the states 0..n-1 (breadth-first from q0, unreachable ones last) and
+        # the symbols 0..k-1, then lay the transitions out as a flat integer table.
+        # `tags` optionally labels final states (e.g. with a lexer rule), default 0.
+        symbols = {symbol: column for column, symbol in enumerate(sorted(self.S))}
+        width = len(symbols)
 
-    def map_groups_to_states(self, P: list[set[STATE]], state_map: Dict[FrozenSet[STATE], STATE]) -> Tuple[STATE, Set[STATE]]:
-        # Map each group in P to a representative state
-        new_F = set()
-        new_q0 = None
+        ids = {self.q0: 0}
+        order = [self.q0]
+        for state in order:
+            for symbol in symbols:
+                target = self.d.get((state, symbol))
+                if target is not None and target not in ids:
+                    ids[target] = len(order)
+                    order.append(target)
+        for state in self.K:
+            if state not in ids:
+                ids[state] = len(order)
+                order.append(state)
 
-        for group in P:
-            if not group:  # Skip empty groups
-                continue
-            group = frozenset(group)
-            repr_state = next(iter(group))  # Choose a representative state
-            state_map[group] = repr_state
-            if self.q0 in group:
-                new_q0 = repr_state
-            if group & self.F:
-                new_F.add(repr_state)
+        table = array('i', [-1]) * (len(order) * width)
+        for (state, symbol), target in self.d.items():
+            table[ids[state] * width + symbols[symbol]] = ids[target]
 
-        return new_q0, new_F
+        state_tags = array('i', [-1]) * len(order)
+        for state in self.F:
+            state_tags[ids[state]] = tags[state] if tags is not None else 0
 
-    def build_new_transitions(self, P: list[set[STATE]], state_map: Dict[FrozenSet[STATE], STATE]) -> Dict[Tuple[STATE, str], STATE]:
-        # Build the new transition function
-        new_d = {}
+        return CompiledDFA(symbols, table, 0, state_tags, tuple(order))
 
-        for (state, symbol), target in self.d.items():
-            new_state, new_target = None, None
-            for group in P:
-                if state in group:
-                    new_state = state_map.get(frozenset(group))
-                if target in group:
-                    new_target = state_map.get(frozenset(group))
-            if new_state is not None and new_target is not None:
-                new_d[(new_state, symbol)] = new_target
+    def remap_states[OTHER_STATE](self, f: Callable[[STATE], 'OTHER_STATE']) -> 'DFA[OTHER_STATE]':
+        # Rename every state through `f`, which should be one-to-one
+        names = {state: f(state) for state in self.K}
+        return DFA(
+            S=set(self.S),
+            K=set(names.values()),
+            q0=names[self.q0],
+            d={(names[state], symbol): names[target] for (state, symbol), target in self.d.items()},
+            F={names[state] for state in self.F}
+        )
+
+    @staticmethod
+    def load(path: str) -> 'DFA[str]':
+        # Read a DFA in the text format of tests_1/ and tests_2/; states are named by strings
+        return CompiledDFA.load(path).to_dfa()
 
-        return new_d
+    def dump(self, path: str, name: Callable[[STATE], str] = str) -> None:
+        # Write the DFA in the same format, each state written as name(state)
+        self.compile().dump(path, name)
 
     def minimize(self) -> 'DFA[STATE]':
-        # Minimize the DFA using partition refinement
-        W = [self.F, self.K - self.F]  # Partitions that wait their turn to be split
-        P = [self.F, self.K - self.F]  # Current partitioning
+        # Minimize the DFA with Hopcroft's algorithm on its dense form; every state
+        # of the result is a representative of its equivalence class
+        return self.compile().minimize().to_dfa()
+
+
+@dataclass(frozen=True)
+class CompiledDFA[STATE]:
+    # Dense form of a DFA: states are 0..n-1, symbols map to columns 0..k-1 and
+    # table[state * k + column] is the target state, or -1 if there is none.
+    # Several symbols may share a column. Symbols are byte values in a DFA built by utf8().
+    symbols: dict[str, int]
+    table: array
+    q0: int
+    # -1 for non-final states, otherwise the tag of the final state
+    tags: array
+    # the original state behind each id
+    states: tuple[STATE, ...]
+
+    @cached_property
+    def width(self) -> int:
+        return len(self.table) // len(self.tags)
+
+    @property
+    def accepting(self) -> bytes:
+        return bytes(tag >= 0 for tag in self.tags)
+
+    def accept(self, word: str) -> bool:
+        symbols, table, width = self.symbols, self.table, self.width
+        current_state = self.q0
+        for char in word:
+            column = symbols.get(char)
+            if column is None:
+                return False
+            current_state = table[current_state * width + column]
+            if current_state < 0:
+                return False
+        return self.tags[current_state] >= 0
+
+    def resume(self, word: str, start: int, state: int) -> tuple[int, int, int, int]:
+        # Run from `state` over word[start:] until the input ends or a transition is
+        # missing. Returns the state reached (-1 if stuck), the tag and end of the last
+        # final state entered on the way (-1, start if none) and where the run stopped.
+        symbols, table, tags = self.symbols, self.table, self.tags
+        width = self.width
+        longest_tag, longest_end = -1, start
+        current_state = state
+        for j in range(start, len(word)):
+            column = symbols.get(word[j])
+            if column is None:
+                return -1, longest_tag, longest_end, j
+            current_state = table[current_state * width + column]
+            if current_state < 0:
+                return -1, longest_tag, longest_end, j
+            tag = tags[current_state]
+            if tag >= 0:
+                longest_tag, longest_end = tag, j + 1
+        return current_state, longest_tag, longest_end, len(word)
+
+    def longest_match(self, word: str, start: int) -> tuple[int, int]:
+        # Tag and end of the longest non-empty prefix of word[start:] that reaches a
+        # final state, or (-1, start)
+        _, tag, end, _ = self.resume(word, start, self.q0)
+        return tag, end
+
+    def utf8(self) -> 'CompiledDFA[STATE | None]':
+        # Equivalent DFA over UTF-8 bytes, to scan bytes, memoryview or mmap input: ASCII
+        # bytes keep the column of their character, the bytes of longer encodings get
+        # columns of their own, and each multi-byte character goes through a chain of
+        # intermediate non-final states (named None)
+        width = self.width
+        symbols: dict[int, int] = {}
+        encodings: dict[str, bytes] = {}
+        for char, column in self.symbols.items():
+            encoded = char.encode('utf-8')
+            if len(encoded) == 1:
+                symbols[encoded[0]] = column
+            else:
+                encodings[char] = encoded
+
+        byte_columns: dict[int, int] = {}
+        for encoded in encodings.values():
+            for byte in encoded:
+                byte_columns.setdefault(byte, width + len(byte_columns))
+        symbols.update(byte_columns)
+        padding = [-1] * len(byte_columns)
+
+        rows = [list(self.table[state * width:(state + 1) * width]) + padding for state in range(len(self.tags))]
+        tags = list(self.tags)
+        states: list[STATE | None] = list(self.states)
+        for state in range(len(self.tags)):
+            # intermediate states after each proper prefix of an encoding, from this state
+            prefixes: dict[bytes, int] = {}
+            for char, encoded in encodings.items():
+                target = self.table[state * width + self.symbols[char]]
+                if target < 0:
+                    continue
+                current = state
+                for length in range(1, len(encoded)):
+                    node = prefixes.get(encoded[:length])
+                    if node is None:
+                        node = prefixes[encoded[:length]] = len(rows)
+                        rows.append([-1] * (width + len(byte_columns)))
+                        tags.append(-1)
+                        states.append(None)
+                        rows[current][byte_columns[encoded[length - 1]]] = node
+                    current = node
+                rows[current][byte_columns[encoded[-1]]] = target
+
+        return CompiledDFA(
+            symbols,
+            array('i', (target for row in rows for target in row)),
+            self.q0,
+            array('i', tags),
+            tuple(states)
+        )
+
+    @staticmethod
+    def load(path: str) -> 'CompiledDFA[str]':
+        # Read the text format of tests_1/ and tests_2/: the section headers #states,
+        # #initial, #accepting, #alphabet and #transitions, each followed by one item
+        # per line, transitions being written 'state:symbol>target'. The file is read
+        # at once and split on its section headers; state names are numbered as they
+        # are met and the transitions go straight into the integer table.
+        # Decoding and splitting it all at once is much faster than text mode reading
+        with open(path, 'rb') as f:
+            text = f.read().decode('utf-8')
+        lines = text.split('\r\n' if text.startswith('#states\r\n') else '\n')
+        if lines[0] != '#states':
+            raise ValueError(f"{path}: invalid file format, expected '#states'")
+        try:
+            initial = lines.index('#initial', 1)
+            accepting = lines.index('#accepting', initial)
+            alphabet = lines.index('#alphabet', accepting)
+            transitions = lines.index('#transitions', alphabet)
+        except ValueError:
+            raise ValueError(f"{path}: invalid file format, missing a section") from None
+
+        ids = {name: state for state, name in enumerate(dict.fromkeys(lines[1:initial]))}
+        symbols = {}
+        for text in lines[alphabet + 1:transitions]:
+            symbols.setdefault(UNESCAPES.get(text, text), len(symbols))
+        width = len(symbols)
+
+        def intern(name: str) -> int:
+            state = ids.get(name)
+            if state is None:
+                # a state missing from #states
+                state = ids[name] = len(ids)
+                table.extend(row)
+            return state
 
-        while W:
-            Q = W.pop()
-            for symbol in self.S:
-                X = self.reversed_delta(symbol, Q)
-                self.split_partition(P, W, X)
+        row = array('i', [-1]) * width
+        table = row * len(ids)
+        for line in lines[transitions + 1:]:
+            if not line:
+                continue
+            # neither names nor ':' contain '>', and names do not contain ':'
+            source, _, target = line.rpartition('>')
+            source, _, symbol = source.partition(':')
+            table[intern(source) * width + symbols[UNESCAPES.get(symbol, symbol)]] = intern(target)
+
+        q0 = intern(lines[initial + 1])
+        tags = array('i', [-1]) * len(ids)
+        for name in lines[accepting + 1:alphabet]:
+            tags[intern(name)] = 0
+        return CompiledDFA(symbols, table, q0, tags, tuple(ids))
+
+    def dump(self, path: str, name: Callable[[STATE], str] = str) -> None:
+        # Write the format read by `load`, each state written as name(state), in one go
+        width, table = self.width, self.table
+        names = [name(state) for state in self.states]
+        columns = sorted(self.symbols.items())
+        texts = [ESCAPES.get(symbol, symbol) for symbol, _ in columns]
+
+        lines = ['#states', *names, '#initial', names[self.q0], '#accepting']
+        lines.extend(names[state] for state, tag in enumerate(self.tags) if tag >= 0)
+        lines.append('#alphabet')
+        lines.extend(texts)
+        lines.append('#transitions')
+        for state, source in enumerate(names):
+            for (_, column), text in zip(columns, texts):
+                target = table[state * width + column]
+                if target >= 0:
+                    lines.append(f'{source}:{text}>{names[target]}')
 
-        state_map = {}
-        new_q0, new_F = self.map_groups_to_states(P, state_map)
-        new_d = self.build_new_transitions(P, state_map)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+            f.write('\n')
+
+    def to_dfa(self) -> DFA[STATE]:
+        width = self.width
+        names = self.states
+        d = {}
+        for state in range(len(names)):
+            for symbol, column in self.symbols.items():
+                target = self.table[state * width + column]
+                if target >= 0:
+                    d[(names[state], symbol)] = names[target]
 
         return DFA(
-            S=self.S,
-            K=set(state_map.values()),
-            q0=new_q0,
-            d=new_d,
-            F=new_F
+            S=set(self.symbols),
+            K=set(names),
+            q0=names[self.q0],
+            d=d,
+            F={names[state] for state, tag in enumerate(self.tags) if tag >= 0}
+        )
+
+    def quotient(self, block: list[int], missing: int = -1) -> 'CompiledDFA[STATE]':
+        # Merge the states that share a block id (ids must be 0..m-1); each block is
+        # named after its first state. Missing transitions go to block `missing`.
+        width = self.width
+        blocks = max(block) + 1
+        first = [-1] * blocks
+        for state, b in enumerate(block):
+            if first[b] < 0:
+                first[b] = state
+
+        table = array('i', [missing]) * (blocks * width)
+        for b, state in enumerate(first):
+            row = state * width
+            for column in range(width):
+                target = self.table[row + column]
+                if target >= 0:
+                    table[b * width + column] = block[target]
+
+        return CompiledDFA(
+            self.symbols,
+            table,
+            block[self.q0],
+            array('i', (self.tags[state] for state in first)),
+            tuple(self.states[state] for state in first)
+        )
+
+    def inverse(self, sink: int) -> tuple[array, array]:
+        # Inverse transition index in CSR form: the states reaching `target` on `column`
+        # are sources[offsets[key]:offsets[key + 1]] with key = target * k + column.
+        # Missing transitions are redirected to `sink`, which loops on every symbol.
+        width = self.width
+        table = self.table + array('i', [sink]) * width
+        offsets = array('i', [0]) * ((sink + 1) * width + 1)
+        for index, target in enumerate(table):
+            if target < 0:
+                target = sink
+            offsets[target * width + index % width + 1] += 1
+        for key in range(1, len(offsets)):
+            offsets[key] += offsets[key - 1]
+
+        sources = array('i', [0]) * len(table)
+        fill = offsets[:-1]
+        for index, target in enumerate(table):
+            if target < 0:
+                target = sink
+            key = target * width + index % width
+            sources[fill[key]] = index // width
+            fill[key] += 1
+        return offsets, sources
+
+    @cached_property
+    def predecessors(self) -> tuple[array, array]:
+        # inverse() without the sink's own row, which only reaches the sink
+        return self.inverse(len(self.tags))
+
+    def unread(self, states: set[int], char: str) -> set[int]:
+        # The states whose transition on `char` leads into `states`
+        column = self.symbols.get(char)
+        if column is None:
+            return set()
+        offsets, sources = self.predecessors
+        width = self.width
+        found = set()
+        for state in states:
+            key = state * width + column
+            found.update(sources[offsets[key]:offsets[key + 1]])
+        return found
+
+    def minimize(self) -> 'CompiledDFA[STATE]':
+        # Hopcroft's algorithm. The partition is kept as one array of states in which
+        # every block is a contiguous slice; marking a state moves it to the front
+        # of its slice, so a block is split in O(marked states).
+        width = self.width
+        n = len(self.tags)
+        # A virtual sink (state n) makes the transition function total
+        sink = n
+        total = n + 1
+        offsets, sources = self.inverse(sink)
+
+        # Initial partition: states grouped by tag, the sink joining the non-final states
+        tag_blocks: dict[int, int] = {}
+        block_of = array('i', [0]) * total
+        for state in range(total):
+            tag = self.tags[state] if state < n else -1
+            block_of[state] = tag_blocks.setdefault(tag, len(tag_blocks))
+        blocks = len(tag_blocks)
+
+        elements = array('i', sorted(range(total), key=block_of.__getitem__))
+        location = array('i', [0]) * total
+        for index, state in enumerate(elements):
+            location[state] = index
+        first = array('i', [0]) * total
+        end = array('i', [0]) * total
+        for index in range(total - 1, -1, -1):
+            first[block_of[elements[index]]] = index
+        for index in range(total):
+            end[block_of[elements[index]]] = index + 1
+        marked = array('i', [0]) * total
+
+        # Every initial block but the largest one is a splitter
+        largest = max(range(blocks), key=lambda b: end[b] - first[b])
+        waiting = [b for b in range(blocks) if b != largest]
+        in_waiting = bytearray(total)
+        for b in waiting:
+            in_waiting[b] = 1
+
+        while waiting:
+            splitter = waiting.pop()
+            in_waiting[splitter] = 0
+            members = elements[first[splitter]:end[splitter]]
+            for column in range(width):
+                touched = []
+                for target in members:
+                    key = target * width + column
+                    for source in sources[offsets[key]:offsets[key + 1]]:
+                        b = block_of[source]
+                        # Swap the source to the end of the marked prefix of its block
+                        position = first[b] + marked[b]
+                        if location[source] < position:
+                            continue
+                        other = elements[position]
+                        elements[position], elements[location[source]] = source, other
+                        location[other], location[source] = location[source], position
+                        if not marked[b]:
+                            touched.append(b)
+                        marked[b] += 1
+
+                for b in touched:
+                    count = marked[b]
+                    marked[b] = 0
+                    if count == end[b] - first[b]:
+                        continue
+                    # The marked prefix becomes a new block
+                    new = blocks
+                    blocks += 1
+                    first[new], end[new] = first[b], first[b] + count
+                    first[b] = end[new]
+                    for index in range(first[new], end[new]):
+                        block_of[elements[index]] = new
+                    if in_waiting[b] or count <= end[b] - first[b]:
+                        waiting.append(new)
+                        in_waiting[new] = 1
+                    else:
+                        waiting.append(b)
+                        in_waiting[b] = 1
+
+        # Renumber the blocks of the real states 0..m-1
+        ids: dict[int, int] = {}
+        block = [ids.setdefault(block_of[state], len(ids)) for state in range(n)]
+        return self.quotient(block, ids.get(block_of[sink], -1))
+
+    def lookahead(self) -> int | None:
+        # The most characters a scan can read past the end of its token before it has
+        # to get stuck: the longest run of non-final states entered from a final state.
+        # When q0 is not final, a scan that never accepts (a rule automaton whose rule
+        # did not win the token, in 'rules' mode) is a run from q0 over the whole token:
+        # q0 reads nothing and the token is at least one character long, so that run
+        # counts minus two.
+        # None if such a run can loop. Meant for trimmed DFAs, where every state can
+        # still reach a final one.
+        width = self.width
+        tags, table = self.tags, self.table
+        # longest[state]: length of the longest run of non-final states starting at state
+        longest = [0] * len(tags)
+        # 0 unvisited, 1 on the current path, 2 done
+        color = bytearray(len(tags))
+
+        for root in range(len(tags)):
+            if tags[root] >= 0 or color[root]:
+                continue
+            color[root] = 1
+            work = [(root, iter(table[root * width:(root + 1) * width]))]
+            while work:
+                state, targets = work[-1]
+                for target in targets:
+                    if target < 0 or tags[target] >= 0:
+                        continue
+                    if color[target] == 1:
+                        return None
+                    if not color[target]:
+                        color[target] = 1
+                        work.append((target, iter(table[target * width:(target + 1) * width])))
+                        break
+                else:
+                    work.pop()
+                    color[state] = 2
+                    row = table[state * width:(state + 1) * width]
+                    longest[state] = 1 + max((longest[t] for t in row if t >= 0 and tags[t] < 0), default=0)
+
+        runs = [
+            longest[target] for state in range(len(tags)) if tags[state] >= 0
+            for target in table[state * width:(state + 1) * width] if target >= 0 and tags[target] < 0
+        ]
+        if tags[self.q0] < 0:
+            runs.append(max(longest[self.q0] - 2, 0))
+        return max(runs, default=0)
+
+    def trim(self) -> 'CompiledDFA[STATE]':
+        # Drop the states that cannot reach a final state (the initial state is always
+        # kept), so that a scanner knows it can stop as soon as a transition yields -1
+        width = self.width
+        n = len(self.tags)
+        predecessors: list[list[int]] = [[] for _ in range(n)]
+        for state in range(n):
+            for target in self.table[state * width:(state + 1) * width]:
+                if target >= 0:
+                    predecessors[target].append(state)
+
+        alive = [tag >= 0 for tag in self.tags]
+        stack = [state for state in range(n) if alive[state]]
+        while stack:
+            for state in predecessors[stack.pop()]:
+                if not alive[state]:
+                    alive[state] = True
+                    stack.append(state)
+        alive[self.q0] = True
+
+        ids = [-1] * n
+        kept = [state for state in range(n) if alive[state]]
+        for new_id, state in enumerate(kept):
+            ids[state] = new_id
+
+        table = array('i', [-1]) * (len(kept) * width)
+        for new_id, state in enumerate(kept):
+            row = state * width
+            for column in range(width):
+                target = self.table[row + column]
+                if target >= 0:
+                    table[new_id * width + column] = ids[target]
+
+        return CompiledDFA(
+            self.symbols,
+            table,
+            ids[self.q0],
+            array('i', (self.tags[state] for state in kept)),
+            tuple(self.states[state] for state in kept)
         )
@@ -0,0 +1,319 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from .DFA import DFA
+from .LazyDFA import CachedDFA
+from .NFA import Arena
+from .Regex import (
+    Regex, Literal, Epsilon, Concatenation, Alternation, KleeneStar, Plus, Question,
+    CharacterClass, Fragment, children
+)
+
+
+@dataclass(frozen=True, eq=False)
+class Empty(Regex):
+    # The empty language, the derivative of a regex on a character it cannot start with
+    def construct(self, arena: Arena) -> Fragment:
+        # a final state that cannot be reached
+        return arena.new_state(), arena.new_state()
+
+
+EMPTY = Empty()
+EPSILON_NODE = Epsilon()
+
+
+# Smart constructors. Their results are in normal form when their arguments are:
+# concatenations are right-deep and alternations are right-deep chains of distinct
+# alternatives in a fixed order, with every character leaf merged into one class, so
+# two derivatives that only differ by associativity, commutativity or idempotence
+# of '|' are the same interned node.
+
+def concatenation(left: Regex, right: Regex) -> Regex:
+    if left is EMPTY or right is EMPTY:
+        return EMPTY
+    if left is EPSILON_NODE:
+        return right
+    if right is EPSILON_NODE:
+        return left
+    factors = []
+    while isinstance(left, Concatenation):
+        factors.append(left.left)
+        left = left.right
+    factors.append(left)
+    for factor in reversed(factors):
+        right = Concatenation(factor, right)
+    return right
+
+
+def alternatives(regex: Regex) -> list[Regex]:
+    # The operands of a chain of alternations, walked with an explicit stack
+    found = []
+    stack = [regex]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Alternation):
+            stack.append(node.right)
+            stack.append(node.left)
+        else:
+            found.append(node)
+    return found
+
+
+def factors(regex: Regex) -> list[Regex]:
+    # The operands of a chain of concatenations, walked with an explicit stack
+    found = []
+    stack = [regex]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Concatenation):
+            stack.append(node.right)
+            stack.append(node.left)
+        else:
+            found.append(node)
+    return found
+
+
+def alternation(nodes: Iterable[Regex]) -> Regex:
+    chars: set[str] = set()
+    unique: dict[Regex, None] = {}
+    for node in nodes:
+        for alternative in alternatives(node):
+            if isinstance(alternative, Literal):
+                chars.add(alternative.char)
+            elif isinstance(alternative, CharacterClass):
+                chars |= alternative.chars
+            elif alternative is not EMPTY:
+                unique[alternative] = None
+    if len(chars) == 1:
+        unique[Literal(next(iter(chars)))] = None
+    elif chars:
+        unique[CharacterClass(chars)] = None
+    if not unique:
+        return EMPTY
+    # interned nodes are equal exactly when they are the same object
+    ordered = sorted(unique, key=id)
+    result = ordered.pop()
+    for node in reversed(ordered):
+        result = Alternation(node, result)
+    return result
+
+
+def star(regex: Regex) -> Regex:
+    if regex is EMPTY or regex is EPSILON_NODE:
+        return EPSILON_NODE
+    if isinstance(regex, KleeneStar):
+        return regex
+    return KleeneStar(regex)
+
+
+class Derivatives:
+    # Brzozowski derivatives of regexes in normal form. Normal forms, nullability and
+    # the derivative of each (node, character) are memoized for the lifetime of this
+    # object; once the regexes are compressed by an Alphabet, every character is the
+    # representative of a class, so the memo holds one derivative per class.
+    # Everything is computed with explicit stacks, as regexes can be deep.
+
+    def __init__(self) -> None:
+        self.normal: dict[Regex, Regex] = {}
+        self.nullables: dict[Regex, bool] = {}
+        self.derivatives: dict[tuple[Regex, str], Regex] = {}
+
+    def clear(self) -> None:
+        # Forget every memoized result, letting go of the derivatives they keep alive
+        self.normal.clear()
+        self.nullables.clear()
+        self.derivatives.clear()
+
+    def normalize(self, regex: Regex) -> Regex:
+        # The same language in normal form, built bottom-up with the smart constructors
+        normal = self.normal
+        stack = [regex]
+        while stack:
+            node = stack[-1]
+            if node in normal:
+                stack.pop()
+                continue
+            # a whole chain of concatenations or alternations is normalized at once,
+            # so that left-deep chains from the parser are not reassociated at every
+            # level
+            if isinstance(node, Concatenation):
+                parts = factors(node)
+            elif isinstance(node, Alternation):
+                parts = alternatives(node)
+            else:
+                parts = children(node)
+            missing = [part for part in parts if part not in normal]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            match node:
+                case Literal() | Epsilon() | Empty():
+                    normal[node] = node
+                case CharacterClass(chars):
+                    normal[node] = alternation([node]) if chars else EMPTY
+                case Concatenation():
+                    result = EPSILON_NODE
+                    for part in reversed(parts):
+                        result = concatenation(normal[part], result)
+                    normal[node] = result
+                case Alternation():
+                    normal[node] = alternation([normal[part] for part in parts])
+                case KleeneStar(expr):
+                    normal[node] = star(normal[expr])
+                case Plus(expr):
+                    normal[node] = concatenation(normal[expr], star(normal[expr]))
+                case Question(expr):
+                    normal[node] = alternation([normal[expr], EPSILON_NODE])
+                case _:
+                    raise ValueError(f"No derivative for {type(node).__name__}")
+        return normal[regex]
+
+    def nullable(self, regex: Regex) -> bool:
+        # Whether a regex in normal form accepts the empty word
+        nullables = self.nullables
+        stack = [regex]
+        while stack:
+            node = stack[-1]
+            if node in nullables:
+                stack.pop()
+                continue
+            if isinstance(node, (Concatenation, Alternation)):
+                missing = [child for child in (node.left, node.right) if child not in nullables]
+                if missing:
+                    stack.extend(missing)
+                    continue
+            stack.pop()
+            if isinstance(node, Concatenation):
+                nullables[node] = nullables[node.left] and nullables[node.right]
+            elif isinstance(node, Alternation):
+                nullables[node] = nullables[node.left] or nullables[node.right]
+            else:
+                nullables[node] = isinstance(node, (Epsilon, KleeneStar))
+        return nullables[regex]
+
+    def derivative(self, regex: Regex, char: str) -> Regex:
+        # The regex, in normal form, of the words w such that char + w is accepted by
+        # `regex`, itself in normal form
+        derivatives = self.derivatives
+        stack = [regex]
+        while stack:
+            node = stack[-1]
+            if (node, char) in derivatives:
+                stack.pop()
+                continue
+            if isinstance(node, Concatenation):
+                # right-deep, so the left operand is never a concatenation
+                parts = [node.left, node.right] if self.nullable(node.left) else [node.left]
+            elif isinstance(node, Alternation):
+                parts = alternatives(node)
+            elif isinstance(node, KleeneStar):
+                parts = [node.expr]
+            else:
+                parts = []
+            missing = [part for part in parts if (part, char) not in derivatives]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            match node:
+                case Literal(other):
+                    derived = EPSILON_NODE if other == char else EMPTY
+                case CharacterClass(chars):
+                    derived = EPSILON_NODE if char in chars else EMPTY
+                case Concatenation(left, right):
+                    derived = concatenation(derivatives[left, char], right)
+                    if len(parts) > 1:
+                        derived = alternation([derived, derivatives[right, char]])
+                case Alternation():
+                    derived = alternation([derivatives[part, char] for part in parts])
+                case KleeneStar(expr):
+                    derived = concatenation(derivatives[expr, char], node)
+                case _:
+                    derived = EMPTY
+            derivatives[node, char] = derived
+        return derivatives[regex, char]
+
+    def step(self, state: tuple[Regex, ...], char: str) -> tuple[Regex, ...] | None:
+        # The derivative of every regex of a combined state, or None once all are empty.
+        # Most rules are dead after a few characters, and most derivatives are known.
+        derivatives = self.derivatives
+        target = []
+        alive = False
+        for regex in state:
+            if regex is not EMPTY:
+                derived = derivatives.get((regex, char))
+                regex = self.derivative(regex, char) if derived is None else derived
+                alive = alive or regex is not EMPTY
+            target.append(regex)
+        return tuple(target) if alive else None
+
+    def tag(self, state: tuple[Regex, ...]) -> int:
+        # Index of the first nullable regex of a combined state, or -1
+        for index, regex in enumerate(state):
+            if self.nullable(regex):
+                return index
+        return -1
+
+
+def derivative_dfa(regexes: Iterable[Regex], symbols: Iterable[str]) -> tuple[DFA[int], dict[int, int]]:
+    # The DFA of the regexes run side by side, built straight from their derivatives:
+    # a state is the tuple of what is left of every regex. Final states are tagged
+    # with the index of the first regex they accept. There is no transition into the
+    # dead state, where every regex is empty.
+    derivatives = Derivatives()
+    symbols = sorted(symbols)
+    start = tuple(derivatives.normalize(regex) for regex in regexes)
+    ids = {start: 0}
+    states = [start]
+    transitions: dict[tuple[int, str], int] = {}
+    for current, state in enumerate(states):
+        for symbol in symbols:
+            target = derivatives.step(state, symbol)
+            if target is None:
+                continue
+            if target not in ids:
+                ids[target] = len(states)
+                states.append(target)
+            transitions[current, symbol] = ids[target]
+
+    tags = {}
+    for current, state in enumerate(states):
+        tag = derivatives.tag(state)
+        if tag >= 0:
+            tags[current] = tag
+    dfa = DFA(
+        S=set(symbols),
+        K=set(range(len(states))),
+        q0=0,
+        d=transitions,
+        F=set(tags)
+    )
+    return dfa, tags
+
+
+class DerivativeDFA(CachedDFA[tuple[Regex, ...]]):
+    # The DFA of derivative_dfa built on demand, like LazyDFA builds the subset
+    # construction: a state is the tuple of what is left of every regex. A flush
+    # also clears the memoized derivatives, which would otherwise keep every
+    # derivative ever reached alive.
+
+    def __init__(
+        self,
+        regexes: Iterable[Regex],
+        max_states: int = 4096,
+        representative: dict[str, str] | None = None
+    ) -> None:
+        self.derivatives = Derivatives()
+        super().__init__(tuple(self.derivatives.normalize(regex) for regex in regexes), max_states, representative)
+
+    def flush(self) -> None:
+        # The initial regexes are already in normal form and are kept by self.initial
+        self.derivatives.clear()
+        super().flush()
+
+    def successor(self, regexes: tuple[Regex, ...], char: str) -> tuple[Regex, ...] | None:
+        return self.derivatives.step(regexes, char)
+
+    def key_tag(self, regexes: tuple[Regex, ...]) -> int:
+        return self.derivatives.tag(regexes)
@@ -0,0 +1,81 @@
+from collections.abc import Iterable
+
+from .DFA import DFA
+from .Glushkov import positions
+from .Regex import Regex
+
+
+def mask_of(found: list[int], offset: int) -> int:
+    mask = 0
+    for position in found:
+        mask |= 1 << (offset + position)
+    return mask
+
+
+def followpos_dfa(regexes: Iterable[Regex], symbols: Iterable[str]) -> tuple[DFA[int], dict[int, int]]:
+    # The DFA of the regexes run side by side, built straight from the positions of
+    # the augmented regexes (r0)#0 | (r1)#1 | ...: a state is the int bitmask of the
+    # positions that can read the next character, and the state reached on a symbol
+    # is the union of followpos(p) over the positions p of the state reading it. The
+    # end marker #i is a position of its own that reads nothing, so a state accepts
+    # rule i when it holds #i; it is tagged with the first rule it accepts. There is
+    # no transition into the dead state, the empty set of positions.
+    symbols = set(symbols)
+    # the symbols read by each position (none for end markers) and its followpos mask
+    reads: list[tuple[str, ...]] = []
+    follow: list[int] = []
+    start = 0
+    # end marker bit -> rule; a marker's bit is below every position of later rules
+    markers: dict[int, int] = {}
+    for index, regex in enumerate(regexes):
+        found = positions(regex)
+        offset = len(reads)
+        marker = 1 << (offset + len(found.symbols))
+        for chars, targets in zip(found.symbols, found.follow):
+            reads.append(tuple(chars & symbols))
+            follow.append(mask_of(targets, offset))
+        for position in found.last:
+            follow[offset + position] |= marker
+        start |= mask_of(found.first, offset)
+        if found.nullable:
+            start |= marker
+        reads.append(())
+        follow.append(0)
+        markers[marker] = index
+    ending = sum(markers)
+
+    ids = {start: 0}
+    masks = [start]
+    transitions: dict[tuple[int, str], int] = {}
+    for current, mask in enumerate(masks):
+        # one pass over the positions of the state fills the targets of every symbol
+        moves: dict[str, int] = {}
+        pending = mask & ~ending
+        while pending:
+            low = pending & -pending
+            position = low.bit_length() - 1
+            for symbol in reads[position]:
+                moves[symbol] = moves.get(symbol, 0) | follow[position]
+            pending ^= low
+        for symbol, next_mask in moves.items():
+            if not next_mask:
+                continue
+            target = ids.get(next_mask)
+            if target is None:
+                target = ids[next_mask] = len(masks)
+                masks.append(next_mask)
+            transitions[current, symbol] = target
+
+    tags = {}
+    for current, mask in enumerate(masks):
+        accepted = mask & ending
+        if accepted:
+            tags[current] = markers[accepted & -accepted]
+    dfa = DFA(
+        S=symbols,
+        K=set(range(len(masks))),
+        q0=0,
+        d=transitions,
+        F=set(tags)
+    )
+    return dfa, tags
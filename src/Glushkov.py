@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+
+from .NFA import NFA, Arena
+from .Regex import (
+    Regex, Literal, Epsilon, Concatenation, Alternation, KleeneStar, Plus, Question,
+    CharacterClass, new_states, children
+)
+
+
+def join(a: list[int], b: list[int]) -> list[int]:
+    # Union of two disjoint position lists, built in the longer one; the lists
+    # belong to the node being built, so they can be reused
+    if len(a) < len(b):
+        a, b = b, a
+    a.extend(b)
+    return a
+
+
+@dataclass
+class Positions:
+    # The positions of a regex, numbered 0..n-1 in the order of its leaves: the
+    # symbols each one reads, the positions that can follow each one, those that can
+    # start and end a word, and whether the empty word is accepted. A follow list
+    # may name a position more than once.
+    symbols: list[frozenset[str]]
+    follow: list[list[int]]
+    first: list[int]
+    last: list[int]
+    nullable: bool
+
+
+def positions(regex: Regex) -> Positions:
+    # nullable/first/last are computed bottom-up with an explicit stack, and the
+    # follow lists grow as soon as a concatenation or a loop links two position sets.
+    # A subtree shared by hash-consing is walked once per occurrence, as each
+    # occurrence has positions of its own.
+    symbols: list[frozenset[str]] = []
+    follow: list[list[int]] = []
+
+    def link(last: list[int], first: list[int]) -> None:
+        for source in last:
+            follow[source].extend(first)
+
+    # (nullable, first, last) of every finished node, in post-order
+    built: list[tuple[bool, list[int], list[int]]] = []
+    stack = [(regex, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if not expanded:
+            below = children(node)
+            if below:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(below))
+                continue
+
+        match node:
+            case Literal(char):
+                built.append((False, [len(symbols)], [len(symbols)]))
+                symbols.append(frozenset((char,)))
+                follow.append([])
+            case CharacterClass(chars):
+                built.append((False, [len(symbols)], [len(symbols)]))
+                symbols.append(chars)
+                follow.append([])
+            case Epsilon():
+                built.append((True, [], []))
+            case Concatenation():
+                right_nullable, right_first, right_last = built.pop()
+                left_nullable, left_first, left_last = built.pop()
+                link(left_last, right_first)
+                built.append((
+                    left_nullable and right_nullable,
+                    join(left_first, right_first) if left_nullable else left_first,
+                    join(right_last, left_last) if right_nullable else right_last
+                ))
+            case Alternation():
+                right_nullable, right_first, right_last = built.pop()
+                left_nullable, left_first, left_last = built.pop()
+                built.append((
+                    left_nullable or right_nullable,
+                    join(left_first, right_first),
+                    join(left_last, right_last)
+                ))
+            case KleeneStar() | Plus() | Question():
+                nullable, first, last = built.pop()
+                if not isinstance(node, Question):
+                    link(last, first)
+                built.append((nullable or not isinstance(node, Plus), first, last))
+            case _:
+                raise ValueError(f"No positions for {type(node).__name__}")
+
+    nullable, first, last = built.pop()
+    return Positions(symbols, follow, first, last, nullable)
+
+
+def glushkov(regex: Regex) -> NFA[int]:
+    # The position automaton of `regex`: one state per position plus an initial
+    # state, and no epsilon edges. A state is entered on the symbols of its
+    # position, from the initial state if the position can start a word, and from
+    # every position it can follow.
+    found = positions(regex)
+    arena = Arena()
+    initial = arena.new_states(len(found.symbols) + 1)
+    for source, targets in [(-1, found.first), *enumerate(found.follow)]:
+        for target in targets:
+            for symbol in found.symbols[target]:
+                arena.add(initial + 1 + source, symbol, initial + 1 + target)
+    final = {initial + 1 + position for position in found.last}
+    if found.nullable:
+        final.add(initial)
+    return arena.view(initial, final, new_states(arena.states))
@@ -0,0 +1,139 @@
+from collections.abc import Hashable
+from typing import FrozenSet
+
+from .NFA import NFA
+
+
+class CachedDFA[KEY: Hashable]:
+    # A DFA built on demand: a state and its transitions are only computed when a scan
+    # reaches them. Subclasses say what a state stands for (a KEY, e.g. a set of NFA
+    # states), which key follows a key on a symbol and how a key is tagged; this
+    # class numbers the keys and caches the transitions. At most `max_states` states
+    # are cached; when the budget is exceeded the whole cache is flushed and rebuilt
+    # from the states that are still in use.
+
+    def __init__(self, initial: KEY, max_states: int, representative: dict[str, str] | None) -> None:
+        if max_states < 3:
+            # the initial state plus both ends of the transition being added
+            raise ValueError("A lazy DFA needs room for at least 3 states")
+        self.max_states = max_states
+        # optional character -> symbol translation, for automata over an Alphabet's classes
+        self.representative = representative
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.initial = initial
+        self.flush()
+
+    def successor(self, key: KEY, symbol: str) -> KEY | None:
+        # The key reached from `key` on `symbol`, or None for the dead state
+        raise NotImplementedError
+
+    def key_tag(self, key: KEY) -> int:
+        # Tag of the state standing for `key`, -1 if it is not final
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        # Forget every cached state; only the initial one is rebuilt right away
+        self.ids: dict[KEY, int] = {}
+        self.states: list[KEY] = []
+        self.tags: list[int] = []
+        self.next: list[dict[str, int]] = []
+        self.q0 = self.intern(self.initial)
+
+    def intern(self, key: KEY) -> int:
+        state = self.ids.get(key)
+        if state is None:
+            state = self.ids[key] = len(self.states)
+            self.states.append(key)
+            self.tags.append(self.key_tag(key))
+            self.next.append({})
+        return state
+
+    def step(self, state: int, char: str) -> int:
+        # Target of `state` on `char`, or -1 for the dead state
+        if self.representative is not None:
+            char = self.representative.get(char)
+            if char is None:
+                return -1
+        target = self.next[state].get(char)
+        if target is not None:
+            self.hits += 1
+            return target
+
+        self.misses += 1
+        key = self.successor(self.states[state], char)
+        if key is None:
+            self.next[state][char] = -1
+            return -1
+        if key not in self.ids and len(self.states) >= self.max_states:
+            # Out of budget: start over, keeping the source state so the edge can be cached
+            source = self.states[state]
+            self.flushes += 1
+            self.flush()
+            state = self.intern(source)
+        target = self.intern(key)
+        self.next[state][char] = target
+        return target
+
+    def tag(self, state: int) -> int:
+        return self.tags[state]
+
+    def accept(self, word: str) -> bool:
+        current_state = self.q0
+        for char in word:
+            current_state = self.step(current_state, char)
+            if current_state < 0:
+                return False
+        return self.tags[current_state] >= 0
+
+    def resume(self, word: str, start: int, state: int) -> tuple[int, int, int, int]:
+        # Same contract as CompiledDFA.resume. A flush during the run only renumbers
+        # the cached states, and the state returned is valid in the current cache.
+        longest_tag, longest_end = -1, start
+        current_state = state
+        for j in range(start, len(word)):
+            current_state = self.step(current_state, word[j])
+            if current_state < 0:
+                return -1, longest_tag, longest_end, j
+            tag = self.tags[current_state]
+            if tag >= 0:
+                longest_tag, longest_end = tag, j + 1
+        return current_state, longest_tag, longest_end, len(word)
+
+    def longest_match(self, word: str, start: int) -> tuple[int, int]:
+        # Tag and end of the longest non-empty match at `start`, or (-1, start)
+        _, tag, end, _ = self.resume(word, start, self.q0)
+        return tag, end
+
+
+class LazyDFA[STATE](CachedDFA[FrozenSet[STATE]]):
+    # The subset construction of an NFA, built on demand: a state is a set of NFA
+    # states, closed under epsilon moves.
+
+    def __init__(
+        self,
+        nfa: NFA[STATE],
+        tags: dict[STATE, int] | None = None,
+        max_states: int = 4096,
+        representative: dict[str, str] | None = None
+    ) -> None:
+        self.nfa = nfa
+        # tag of each final NFA state (e.g. a lexer rule index), default 0
+        self.final_tags = tags if tags is not None else dict.fromkeys(nfa.F, 0)
+        super().__init__(nfa.closure_of_set((nfa.q0,)), max_states, representative)
+
+    @property
+    def sets(self) -> list[FrozenSet[STATE]]:
+        # the NFA states behind each cached state
+        return self.states
+
+    def successor(self, nfa_states: FrozenSet[STATE], char: str) -> FrozenSet[STATE] | None:
+        d = self.nfa.d
+        moved = set()
+        for nfa_state in nfa_states:
+            moved.update(d.get((nfa_state, char), ()))
+        return self.nfa.closure_of_set(moved) if moved else None
+
+    def key_tag(self, nfa_states: FrozenSet[STATE]) -> int:
+        return min((self.final_tags[s] for s in nfa_states if s in self.final_tags), default=-1)
@@ -1,55 +1,641 @@
-from .Regex import Regex, parse_regex
-from .NFA import NFA
+import mmap
+import multiprocessing
+import os
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from functools import cached_property
+from typing import TextIO
+
+from . import Cache
+from .Regex import Regex, parse_regex, new_state, size
+from .NFA import NFA, EPSILON
+from .DFA import DFA, CompiledDFA
+from .LazyDFA import CachedDFA, LazyDFA
+from .Alphabet import Alphabet, partition
+from .Glushkov import glushkov
+from .Derivative import DerivativeDFA, derivative_dfa
+from .Followpos import followpos_dfa
+from .Tokens import LineIndex, Offsets, Span, TokenBuffer
+from .Trace import NULL_TRACER, NullTracer, Tracer
+
+
+MODES = ('combined', 'rules', 'lazy')
+# regex -> NFA constructions: Thompson's, with epsilon edges, or the epsilon-free
+# position automaton
+CONSTRUCTIONS: dict[str, Callable[[Regex], NFA[int]] | None] = {
+    'thompson': Regex.thompson,
+    'glushkov': glushkov,
+    # no NFA: DFAs straight from the Brzozowski derivatives of the rules, or from
+    # the followpos sets of their positions
+    'derivative': None,
+    'followpos': None,
+}
+# regexes -> (DFA, tags) for the constructions without an NFA
+DIRECT: dict[str, Callable[[list[Regex], set[str]], tuple[DFA[int], dict[int, int]]]] = {
+    'derivative': derivative_dfa,
+    'followpos': followpos_dfa,
+}
+
+
+@dataclass(frozen=True)
+class CompiledSpec:
+    # Everything `lex` needs, built once per spec and shared by every call
+    mode: str
+    tokens: tuple[str, ...]
+    # the automata read class representatives; their symbol tables cover every character
+    alphabet: Alphabet
+    # final states are tagged with the index of the earliest spec rule they accept
+    automata: tuple[CompiledDFA[int] | LazyDFA[int] | DerivativeDFA, ...]
+
+
+def union(nfas: list[NFA[int]]) -> tuple[NFA[int], dict[int, int]]:
+    # Join the rule NFAs under a fresh initial state and remember which rule
+    # each final state belongs to
+    start = new_state()
+    delta = {(start, EPSILON): {nfa.q0 for nfa in nfas}}
+    rule_of = {}
+    for index, nfa in enumerate(nfas):
+        delta.update(nfa.d)
+        for state in nfa.F:
+            rule_of[state] = index
+
+    nfa = NFA(
+        S=set().union(*(nfa.S for nfa in nfas)),
+        K=set().union({start}, *(nfa.K for nfa in nfas)),
+        q0=start,
+        d=delta,
+        F=set(rule_of)
+    )
+    return nfa, rule_of
+
+
+def nfa_sizes(nfa: NFA) -> dict[str, int]:
+    return {'nfa_states': len(nfa.K), 'nfa_transitions': sum(map(len, nfa.d.values()))}
+
+
+def determinize(
+    nfa: NFA[int],
+    rule_of: dict[int, int],
+    alphabet: Alphabet,
+    tracer: Tracer | NullTracer = NULL_TRACER,
+    **args: object
+) -> CompiledDFA[int]:
+    # `args` name the automaton in the tracer's spans
+    with tracer.span('subset_construction', **args) as span:
+        dfa, sets = nfa.subset_construction_bitset(keep_sets=True)
+        tags = {}
+        for state in dfa.F:
+            tags[state] = min(rule_of[s] for s in sets[state] if s in rule_of)
+        if span is not None:
+            span.update(nfa_sizes(nfa), dfa_states=len(dfa.K))
+    return minimize(dfa, tags, alphabet, tracer, **args)
+
+
+def minimize(
+    dfa: DFA[int],
+    tags: dict[int, int],
+    alphabet: Alphabet,
+    tracer: Tracer | NullTracer = NULL_TRACER,
+    **args: object
+) -> CompiledDFA[int]:
+    with tracer.span('minimize', **args) as span:
+        # Trimming removes the empty-set sink, so the scanner stops on the first -1
+        compiled = dfa.compile(tags).minimize().trim()
+        if span is not None:
+            span.update(states_before=len(dfa.K), states_after=len(compiled.tags))
+    # One lookup takes an input character straight to the column of its class
+    return replace(compiled, symbols=alphabet.expand(compiled.symbols))
+
+
+def parse_spec(
+    rules: list[tuple[str, str]],
+    tracer: Tracer | NullTracer = NULL_TRACER
+) -> list[tuple[str, Regex]]:
+    spec = []
+    for token, regex in rules:
+        with tracer.span('parse_regex', rule=token) as span:
+            spec.append((token, parse_regex(regex)))
+            if span is not None:
+                span.update(length=len(regex), ast_nodes=size(spec[-1][1]))
+    return spec
+
+
+def compile_spec(
+    spec: list[tuple[str, Regex]],
+    mode: str = 'combined',
+    max_states: int = 4096,
+    tracer: Tracer | NullTracer = NULL_TRACER,
+    construction: str = 'thompson'
+) -> CompiledSpec:
+    if mode not in MODES:
+        raise ValueError(f"Unknown lexer mode {mode!r}, expected one of {MODES}")
+    if construction not in CONSTRUCTIONS:
+        raise ValueError(f"Unknown NFA construction {construction!r}, expected one of {tuple(CONSTRUCTIONS)}")
+    build_nfa = CONSTRUCTIONS[construction]
+    if construction == 'followpos' and mode == 'lazy':
+        # followpos has no lazy variant: the lazy mode falls back to determinizing
+        # the Glushkov automaton on demand
+        build_nfa = glushkov
+
+    # Build every automaton over classes of characters the rules cannot tell apart
+    with tracer.span('partition', rules=len(spec)) as span:
+        alphabet = partition(regex for _, regex in spec)
+        if span is not None:
+            span.update(classes=len(alphabet.classes))
+    # subtrees shared by several rules are compressed once
+    compressed: dict[Regex, Regex] = {}
+    tokens = tuple(token for token, _ in spec)
+    if build_nfa is None:
+        regexes = [alphabet.compress(regex, compressed) for _, regex in spec]
+        automata = derive(tokens, regexes, mode, max_states, alphabet, tracer, construction)
+        return CompiledSpec(mode, tokens, alphabet, tuple(automata))
+
+    nfas = []
+    for token, regex in spec:
+        with tracer.span(construction, rule=token) as span:
+            nfas.append(build_nfa(alphabet.compress(regex, compressed)))
+            if span is not None:
+                span.update(nfa_sizes(nfas[-1]))
+
+    if mode == 'combined':
+        # One max-munch DFA for the whole spec
+        automata = [determinize(*union(nfas), alphabet, tracer, rule='*')]
+    elif mode == 'lazy':
+        # The same DFA, determinized only where the input goes, in a bounded cache
+        with tracer.span('lazy_dfa', rule='*') as span:
+            nfa, rule_of = union(nfas)
+            automata = [LazyDFA(nfa, rule_of, max_states, alphabet.representative)]
+            if span is not None:
+                span.update(nfa_sizes(nfa))
+    else:
+        # One DFA per rule, each tagged with its position in the spec
+        automata = [
+            determinize(nfa, dict.fromkeys(nfa.F, index), alphabet, tracer, rule=token)
+            for index, (nfa, (token, _)) in enumerate(zip(nfas, spec))
+        ]
+
+    return CompiledSpec(mode, tokens, alphabet, tuple(automata))
+
+
+def derive(
+    tokens: tuple[str, ...],
+    regexes: list[Regex],
+    mode: str,
+    max_states: int,
+    alphabet: Alphabet,
+    tracer: Tracer | NullTracer = NULL_TRACER,
+    construction: str = 'derivative'
+) -> list[CompiledDFA[int] | DerivativeDFA]:
+    # compile_spec's automata, built by one of the DIRECT constructions from the
+    # compressed rules over the class representatives
+    symbols = set(alphabet.representative.values())
+    build_dfa = DIRECT[construction]
+    if mode == 'lazy':
+        return [DerivativeDFA(regexes, max_states, alphabet.representative)]
+    if mode == 'combined':
+        groups = [('*', regexes, 0)]
+    else:
+        groups = [(token, [regex], index) for index, (token, regex) in enumerate(zip(tokens, regexes))]
+    automata = []
+    for token, group, first in groups:
+        with tracer.span(f'{construction}_dfa', rule=token) as span:
+            dfa, tags = build_dfa(group, symbols)
+            if span is not None:
+                span.update(dfa_states=len(dfa.K))
+        tags = {state: first + tag for state, tag in tags.items()}
+        automata.append(minimize(dfa, tags, alphabet, tracer, rule=token))
+    return automata
+
+
+@dataclass(frozen=True)
+class Relex:
+    # Result of Lexer.relex: the tokens of the new text, and which of the old ones
+    # changed. tokens[first:first + inserted] replaced old[first:first + removed];
+    # the tokens around them are the old ones.
+    tokens: list[tuple[str, str]]
+    first: int
+    removed: int
+    inserted: int
+
+
+def error_message(where: int | str, line: int) -> str:
+    return f"No viable alternative at character {where}, line {line}"
+
+
+def error(buffer: str | bytes | memoryview | mmap.mmap, stop: int) -> list[tuple[str, str]]:
+    # What lexing returns when a scan gets stuck at `stop` without a token: the column
+    # and line of the character it could not read, or EOF if the input ended first.
+    # In a byte buffer the column counts the characters of the decoded line prefix,
+    # as it would in the str of the same text.
+    line, column = LineIndex(buffer).position(stop)
+    if not isinstance(buffer, str):
+        column = len(bytes(buffer[stop - column:stop]).decode('utf-8', 'replace'))
+    return [("", error_message('EOF' if stop >= len(buffer) else column, line))]
+
+
+def reach_back(automata: tuple[CompiledDFA, ...], text: str, offsets: Offsets, first: int, start: int) -> int:
+    # The earliest token before `first` whose scan read text[start], found by walking
+    # back from `start` with, for each automaton, the states from which text[p:start]
+    # is read without getting stuck: the scan from p read text[start] when q0 is one
+    # of them, and once none is left no scan from further back did. A non-final loop
+    # that can read the text, such as the body of an unclosed string, keeps the walk
+    # going, up to the start of the text in the worst case; the sets then repeat, so
+    # each step back is memoized on (sets, character).
+    # each step gives the sets, whether any is left and whether q0 is in one of them
+    type Live = tuple[frozenset[int], ...]
+    steps: dict[tuple[Live, str], tuple[Live, bool, bool]] = {}
+    live: Live = tuple(frozenset(range(len(automaton.tags))) for automaton in automata)
+    alive, starts = True, False
+    p = start
+    for index in range(first - 1, -1, -1):
+        while p > offsets[index] and alive:
+            p -= 1
+            key = live, text[p]
+            step = steps.get(key)
+            if step is None:
+                sets = tuple(frozenset(automaton.unread(states, text[p])) for automaton, states in zip(automata, live))
+                starts = any(automaton.q0 in states for automaton, states in zip(automata, sets))
+                step = steps[key] = sets, any(sets), starts
+            live, alive, starts = step
+        if not alive:
+            break
+        if starts:
+            first = index
+    return first
+
+
+# The spec being lexed by lex_parallel and its text, set in each worker process
+worker_automata: tuple[CompiledDFA | LazyDFA | DerivativeDFA, ...] = ()
+worker_names: tuple[str, ...] = ()
+worker_text = ''
+
+
+def init_worker(automata: tuple[CompiledDFA | LazyDFA | DerivativeDFA, ...], names: tuple[str, ...], text: str) -> None:
+    global worker_automata, worker_names, worker_text
+    worker_automata, worker_names, worker_text = automata, names, text
+
+
+def lex_chunk(start: int, limit: int) -> tuple[array, int, list[tuple[str, str]]]:
+    # Lex the worker's text from `start` as if a token started there, keeping the
+    # tokens that start before `limit`, and stopping early at an error. Returns where
+    # each token starts, where the last one ends and the (token, lexeme) pairs.
+    starts = array('q')
+    tokens = []
+    text = worker_text
+    i = start
+    while i < limit:
+        longest_tag, longest_end = -1, i
+        for automaton in worker_automata:
+            _, tag, end, _ = automaton.resume(text, i, automaton.q0)
+            if tag >= 0 and end > longest_end:
+                longest_tag, longest_end = tag, end
+        if longest_tag < 0:
+            break
+        starts.append(i)
+        tokens.append((worker_names[longest_tag], text[i:longest_end]))
+        i = longest_end
+    return starts, i, tokens
+
 
 class Lexer:
-    def __init__(self, spec: list[tuple[str, str]]) -> None:
-        self.spec = [(token, parse_regex(regex)) for token, regex in spec]
+    def __init__(
+        self,
+        spec: list[tuple[str, str]],
+        mode: str = 'combined',
+        max_states: int = 4096,
+        cache_dir: str | None = None,
+        tracer: Tracer | None = None,
+        construction: str = 'thompson'
+    ) -> None:
+        # `max_states` bounds the state cache of the 'lazy' mode. The compiled spec is
+        # kept in `cache_dir` (default $LEXER_CACHE_DIR) under a hash of the spec, the
+        # options and the library version, and loaded from there when present.
+        # `tracer` records the time and output size of every compile phase.
+        # `construction` picks how each rule becomes an NFA, or a DFA for the DIRECT
+        # ones, one of CONSTRUCTIONS.
+        self.rules = [(token, regex) for token, regex in spec]
+        self.construction = construction
+        tracer = tracer or NULL_TRACER
+        directory = Cache.cache_directory(cache_dir)
+        # every phase, the cache's included, nests under one compile span
+        with tracer.span('compile', mode=mode, rules=len(self.rules)):
+            if directory is None:
+                self.compiled = self.build(mode, max_states, tracer)
+                return
+
+            key = Cache.cache_key(self.rules, mode, max_states, construction)
+            with tracer.span('cache_load') as span:
+                compiled = Cache.load(directory, key)
+                if span is not None:
+                    span.update(hit=isinstance(compiled, CompiledSpec))
+            if not isinstance(compiled, CompiledSpec) or compiled.mode != mode:
+                compiled = self.build(mode, max_states, tracer)
+                with tracer.span('cache_store'):
+                    Cache.store(directory, key, compiled)
+            self.compiled = compiled
+
+    def build(self, mode: str, max_states: int, tracer: Tracer | NullTracer) -> CompiledSpec:
+        self.spec = parse_spec(self.rules, tracer)
+        return compile_spec(self.spec, mode, max_states, tracer, self.construction)
 
-    def lex(self, word: str) -> list[tuple[str, str]] | None:
+    @cached_property
+    def spec(self) -> list[tuple[str, Regex]]:
+        # The parsed rules, only needed to compile
+        return parse_spec(self.rules)
+
+    def longest_match(
+        self,
+        word: str | bytes | memoryview | mmap.mmap,
+        i: int,
+        automata: tuple[CompiledDFA | LazyDFA | DerivativeDFA, ...] | None = None
+    ) -> tuple[int, int, int]:
+        # Rule index and end of the longest token at `i`, or (-1, i), and where the scan
+        # got stuck (len(word) if it did not). There is a single automaton in 'combined'
+        # and 'lazy' mode, one per rule in 'rules' mode. On equal lengths the earlier
+        # rule wins. `automata` defaults to the compiled ones; byte input needs the
+        # byte automata.
+        if automata is None:
+            automata = self.compiled.automata
+        longest_tag, longest_end, longest_stop = -1, i, i
+        for automaton in automata:
+            _, tag, end, stop = automaton.resume(word, i, automaton.q0)
+            if end > longest_end:
+                longest_tag, longest_end = tag, end
+            longest_stop = max(longest_stop, stop)
+        return longest_tag, longest_end, longest_stop
+
+    def scan(self, buffer: str | bytes | memoryview | mmap.mmap) -> Iterator[tuple[int, int, int]]:
+        # Rule index, start and end of each token of `buffer`, ending with (-1, i, stop)
+        # at the first position where no token matches, `stop` being where the scan got
+        # stuck (len(buffer) if the input ran out). Byte input is read as UTF-8 through
+        # the byte automata. Only offsets are tracked: nothing is sliced, not even the
+        # token finally chosen.
+        automata = self.compiled.automata if isinstance(buffer, str) else self.byte_automata
         i = 0
+        length = len(buffer)
+
+        while i < length:
+            longest_tag, longest_end, longest_stop = self.longest_match(buffer, i, automata)
+            if longest_tag < 0:
+                yield -1, i, longest_stop
+                return
+
+            yield longest_tag, i, longest_end
+            i = longest_end
+
+    def spans(self, buffer: str | bytes | memoryview | mmap.mmap) -> list[Span] | list[tuple[str, str]]:
+        # The tokens of `buffer` as spans over it; a lexeme is only sliced (and decoded)
+        # when a span is asked for it
+        names = self.compiled.tokens
+        spans = []
+        for tag, start, end in self.scan(buffer):
+            if tag < 0:
+                return error(buffer, end)
+            spans.append(Span(names[tag], start, end, buffer))
+        return spans
+
+    def lex(self, word: str) -> list[tuple[str, str]]:
+        names = self.compiled.tokens
         tokens = []
-        line = 0
-        column = 0
-
-        while i < len(word):
-            longest_match = None
-            longest_token = None
-            longest_length = 0
-
-            # Try matching each regex in the spec
-            for token, regex in self.spec:
-                nfa = regex.thompson()
-                dfa = nfa.subset_construction()
-                j = i
-                current_state = dfa.q0
-
-                # Simulate the DFA for the current regex
-                while j < len(word) and (current_state, word[j]) in dfa.d:
-                    current_state = dfa.d[(current_state, word[j])]
-                    j += 1
-                    if current_state in dfa.F:
-                        match_length = j - i
-                        if match_length > longest_length:
-                            longest_match = word[i:j]
-                            longest_token = token
-                            longest_length = match_length
-
-            # If no match is found, return an error
-            if not longest_match:
-                return "Error"
-            
-            # Add the matched token to the result and move the pointer
-            tokens.append((longest_token, longest_match))
-            i += longest_length
+        for tag, start, end in self.scan(word):
+            # If no match is found, report where the scan got stuck
+            if tag < 0:
+                return error(word, end)
+            tokens.append((names[tag], word[start:end]))
+        return tokens
+
+    def lex_buffer(self, word: str | bytes | memoryview | mmap.mmap) -> TokenBuffer | list[tuple[str, str]]:
+        # Same tokens as `lex`, kept in columns instead of a list of tuples
+        result = TokenBuffer(self.compiled.tokens, word)
+        append = result.append
+        for tag, start, end in self.scan(word):
+            if tag < 0:
+                return error(word, end)
+            append(tag, start, end)
+        return result
+
+    def lex_parallel(
+        self,
+        text: str,
+        workers: int | None = None,
+        chunk_size: int = 1 << 20
+    ) -> list[tuple[str, str]]:
+        # Same result as `lex`, with the text cut into chunks that are lexed in a
+        # process pool. Each worker guesses that a token starts at its chunk's start.
+        # The chunks are then stitched together in order: from the current position,
+        # the tokens of the chunk containing it are adopted as soon as one of them
+        # starts there (lexing is deterministic from a token boundary); otherwise one
+        # token is lexed here and the position checked again. Workers build the
+        # (token, lexeme) pairs, and read the text in place where processes are
+        # forked, instead of a copy of their chunk.
+        workers = workers or os.cpu_count() or 1
+        length = len(text)
+        if workers < 2 or length < chunk_size:
+            return self.lex(text)
+
+        count = max(workers, -(-length // chunk_size))
+        bounds = [length * k // count for k in range(count + 1)]
+        forking = 'fork' in multiprocessing.get_all_start_methods()
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context('fork') if forking else None,
+            initializer=init_worker,
+            initargs=(self.compiled.automata, self.compiled.tokens, text)
+        ) as pool:
+            chunks = list(pool.map(lex_chunk, bounds[:-1], bounds[1:]))
+
+        names = self.compiled.tokens
+        tokens = []
+        i = 0
+        k = 0
+        while i < length:
+            while bounds[k + 1] <= i:
+                k += 1
+            starts, end, pairs = chunks[k]
+            index = bisect_left(starts, i)
+            if index < len(starts) and starts[index] == i:
+                # Resynchronized: the rest of this chunk's tokens are the sequential ones
+                tokens.extend(pairs[index:])
+                i = end
+                continue
 
+            longest_tag, longest_end, stop = self.longest_match(text, i)
+            if longest_tag < 0:
+                return error(text, stop)
+            tokens.append((names[longest_tag], text[i:longest_end]))
+            i = longest_end
 
         return tokens
 
+    @cached_property
+    def lookahead(self) -> int | None:
+        # How far past the end of its token a scan may read, or None if unbounded
+        # (or unknown, in 'lazy' mode)
+        bound = 0
+        for automaton in self.compiled.automata:
+            if isinstance(automaton, CachedDFA):
+                return None
+            chars = automaton.lookahead()
+            if chars is None:
+                return None
+            bound = max(bound, chars)
+        return bound
+
+    def relex(
+        self,
+        tokens: list[tuple[str, str]],
+        start: int,
+        end: int,
+        text: str,
+        offsets: Offsets | None = None
+    ) -> Relex | list[tuple[str, str]]:
+        # Update `tokens`, the result of `lex` on the old text, after its characters
+        # [start, end) were replaced to give `text`. A token can only change if its scan
+        # read the edited text: those scans are found going back from the edit, and
+        # lexing restarts at the earliest one. It stops at the first token boundary past
+        # the edit that was also an old boundary, since the rest lexes as it did.
+        # An editor passes `offsets`, the Offsets of `tokens`, which it keeps between
+        # edits: both are then updated in place, so an edit costs about the tokens it
+        # changes. Without them the offsets are computed and a new list is returned.
+        in_place = offsets is not None
+        if offsets is None:
+            offsets = Offsets(len(lexeme) for _, lexeme in tokens)
+        if not 0 <= start <= end <= offsets[-1]:
+            raise ValueError(f"Edit [{start}, {end}) is outside of the old text")
+        delta = len(text) - offsets[-1]
+        automata = self.compiled.automata
+        lookahead = self.lookahead
+
+        # The token containing `start`, or the end of the list
+        first = offsets.bisect(start + 1) - 1 if start < offsets[-1] else len(tokens)
+        # A scan read text[start] if it was still alive after text[:start], which did not
+        # change, and it reads at most `lookahead` characters past the end of its token.
+        # Without a bound, compiled automata are walked back over their transitions;
+        # lazy ones have no table to walk back on, so in 'lazy' mode every earlier
+        # scan is rerun and an edit costs up to the length of the text before it.
+        if lookahead is None and all(isinstance(automaton, CompiledDFA) for automaton in automata):
+            first = reach_back(automata, text, offsets, first, start)
+        else:
+            for index in range(first - 1, -1, -1):
+                if lookahead is not None and offsets[index + 1] + lookahead < start:
+                    break
+                if any(automaton.resume(text, offsets[index], automaton.q0)[3] >= start for automaton in automata):
+                    first = index
+
+        names = self.compiled.tokens
+        inserted = []
+        i = offsets[first]
+        resync = len(tokens)
+        while i < len(text):
+            if i >= end + delta:
+                old = offsets.bisect(i - delta)
+                if offsets[old] == i - delta:
+                    resync = old
+                    break
+
+            longest_tag, longest_end, stop = self.longest_match(text, i)
+            if longest_tag < 0:
+                return error(text, stop)
+            inserted.append((names[longest_tag], text[i:longest_end]))
+            i = longest_end
+
+        if not in_place:
+            return Relex(tokens[:first] + inserted + tokens[resync:], first, resync - first, len(inserted))
+        tokens[first:resync] = inserted
+        offsets.replace(first, resync, [len(lexeme) for _, lexeme in inserted])
+        return Relex(tokens, first, resync - first, len(inserted))
+
+    @cached_property
+    def byte_automata(self) -> tuple[CompiledDFA, ...]:
+        # UTF-8 versions of the automata, built on first use
+        if self.compiled.mode == 'lazy':
+            raise ValueError("Byte input needs the 'combined' or 'rules' mode")
+        return tuple(automaton.utf8() for automaton in self.compiled.automata)
+
+    def lex_file(self, path: str) -> list[Span] | list[tuple[str, str]]:
+        # Lex an ASCII or UTF-8 file in place through a read-only memory map. The spans
+        # point into the mapping, which stays open for as long as they are referenced.
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self.spans(buffer)
+
+    def lex_stream(self, source: TextIO | Iterable[str], chunk_size: int = 1 << 16) -> Iterator[tuple[str, str]]:
+        # Lex a text file or an iterable of string chunks, yielding the same tokens as
+        # `lex` on the whole text as soon as they are decided. Only the text from the
+        # start of the pending token is kept, and the automata carry their state over
+        # chunk boundaries instead of rescanning it. Where `lex` would fail, raises
+        # ValueError with its error message, after yielding the tokens before that point.
+        # Lines are counted in the text as it is dropped.
+        if hasattr(source, 'read'):
+            chunks = iter(lambda: source.read(chunk_size), '')
+        else:
+            chunks = iter(source)
+
+        automata = self.compiled.automata
+        names = self.compiled.tokens
+        buffer = ''
+        start = 0  # where the pending token starts in `buffer`
+        position = 0  # where the automata still alive resume
+        states = [automaton.q0 for automaton in automata]
+        longest_tag, longest_end = -1, 0
+        stuck = 0  # where the pending token's scans got stuck
+        line = 0  # lines before `buffer`
+        line_start = 0  # where the last of them starts, relative to `buffer`
+
+        while True:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                # Drop the emitted text; the pending token and the scan positions move with it
+                line += buffer.count('\n', 0, start)
+                line_start = buffer.rfind('\n', 0, start) + 1 or line_start
+                buffer = buffer[start:] + chunk
+                position -= start
+                longest_end -= start
+                stuck -= start
+                line_start -= start
+                start = 0
+
+            while start < len(buffer):
+                alive = False
+                for index, automaton in enumerate(automata):
+                    if states[index] >= 0:
+                        states[index], tag, end, stop = automaton.resume(buffer, position, states[index])
+                        alive = alive or states[index] >= 0
+                        stuck = max(stuck, stop)
+                        # On equal lengths the earlier rule wins
+                        if tag >= 0 and (end > longest_end or (end == longest_end and tag < longest_tag)):
+                            longest_tag, longest_end = tag, end
+                position = len(buffer)
+
+                if alive and chunk is not None:
+                    # The longest match may continue in the next chunk
+                    break
+
+                if longest_tag < 0:
+                    line += buffer.count('\n', 0, stuck)
+                    line_start = buffer.rfind('\n', 0, stuck) + 1 or line_start
+                    where = 'EOF' if stuck >= len(buffer) else stuck - line_start
+                    raise ValueError(error_message(where, line))
+
+                yield names[longest_tag], buffer[start:longest_end]
+                start = position = stuck = longest_end
+                states = [automaton.q0 for automaton in automata]
+                longest_tag = -1
+
+            if chunk is None:
+                return
+
 # Main
 if __name__ == '__main__':
     spec = [("ones", "11+"), ("pair", "01|10"), ("other", "0|1")]
     lexer = Lexer(spec)
     test = "1001"
-    
+
     result = lexer.lex(test)
-    print(result)
\ No newline at end of file
+    print(result)
@@ -1,7 +1,9 @@
+from array import array
+
 from .DFA import DFA
 
-from dataclasses import dataclass
-from collections.abc import Callable
+from dataclasses import dataclass, field
+from collections.abc import Callable, Iterable
 from typing import FrozenSet, Set, Dict, Tuple
 
 EPSILON = ''
@@ -14,20 +16,91 @@ class NFA[STATE]:
     d: dict[tuple[STATE, str], set[STATE]]
     F: set[STATE]
 
+    # Epsilon closure of every state, filled in on the first closure query. The NFA
+    # is not expected to change once its closures have been asked for.
+    closures: dict[STATE, FrozenSet[STATE]] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def closure_table(self) -> dict[STATE, FrozenSet[STATE]]:
+        # Condense the epsilon graph into strongly connected components (iterative
+        # Tarjan). Every state of a component has the same closure, and a component is
+        # completed only after all the components it reaches, so each closure is the
+        # component itself plus the already known closures of its successors.
+        if self.closures:
+            return self.closures
+
+        successors = {}
+        for (state, symbol), targets in self.d.items():
+            if symbol == EPSILON:
+                successors[state] = targets
+        states = set(self.K)
+        for state, targets in successors.items():
+            states.add(state)
+            states.update(targets)
+
+        index: dict[STATE, int] = {}
+        low: dict[STATE, int] = {}
+        on_stack: set[STATE] = set()
+        stack: list[STATE] = []
+        table = self.closures
+
+        for root in states:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(successors.get(root, ())))]
+
+            while work:
+                current, edges = work[-1]
+                for target in edges:
+                    if target not in index:
+                        index[target] = low[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(successors.get(target, ()))))
+                        break
+                    if target in on_stack:
+                        low[current] = min(low[current], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[current])
+                    if low[current] == index[current]:
+                        component = set()
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.add(member)
+                            if member == current:
+                                break
+                        closure = set(component)
+                        for member in component:
+                            for target in successors.get(member, ()):
+                                if target not in component:
+                                    closure |= table[target]
+                        closure = frozenset(closure)
+                        for member in component:
+                            table[member] = closure
+
+        return table
+
     def epsilon_closure(self, state: STATE) -> set[STATE]:
-        
-        closure = {state}
-        stack = [state]
-        
-        while stack:
-            current = stack.pop()
-            if (current, EPSILON) in self.d:
-                for next_state in self.d[(current, EPSILON)]:
-                    if next_state not in closure:
-                        closure.add(next_state)
-                        stack.append(next_state)
-        
-        return closure
+        table = self.closure_table()
+        if state in table:
+            return set(table[state])
+        return {state}
+
+    def closure_of_set(self, states: Iterable[STATE]) -> FrozenSet[STATE]:
+        # Union of the closures of `states` in one pass; a state that is already in
+        # the result contributes nothing new
+        table = self.closure_table()
+        closure: set[STATE] = set()
+        for state in states:
+            if state not in closure:
+                closure |= table.get(state, (state,))
+        return frozenset(closure)
     
     def is_final_state(self, dfa_state: FrozenSet[STATE], dfa_final_states: Set[FrozenSet[STATE]]) -> bool:
         is_final = any(state in self.F for state in dfa_state)
@@ -41,8 +114,7 @@ class NFA[STATE]:
         alphabet = self.S - {EPSILON}
 
         # Initial state of DFA is the epsilon closure of the NFA's initial state
-        initial_closure = self.epsilon_closure(self.q0)
-        dfa_initial_state = frozenset(initial_closure)
+        dfa_initial_state = self.closure_of_set((self.q0,))
 
         # Initialize DFA components
         dfa_states: Set[FrozenSet[STATE]] = {dfa_initial_state}
@@ -65,13 +137,8 @@ class NFA[STATE]:
                     if (nfa_state, symbol) in self.d:
                         next_states.update(self.d[(nfa_state, symbol)])
 
-                # Compute the epsilon closure of the reachable states
-                combined_closure = set()
-                for state in next_states:
-                    combined_closure.update(self.epsilon_closure(state))
-
-                # Convert to frozenset for immutability and as DFA state
-                next_dfa_state = frozenset(combined_closure)
+                # The epsilon closure of the reachable states is the next DFA state
+                next_dfa_state = self.closure_of_set(next_states)
 
                 # Add the transition to the DFA
                 dfa_transitions[(current_dfa_state, symbol)] = next_dfa_state
@@ -93,9 +160,149 @@ class NFA[STATE]:
             F=dfa_final_states
         )
 
-        
-    
+
+    def subset_construction_bitset(self, keep_sets: bool = False) -> tuple[DFA[int], list[FrozenSet[STATE]] | None]:
+        # Same construction with the NFA states renumbered 0..n-1 and every set of
+        # NFA states held as an int bitmask. The DFA states are 0..m-1 in discovery
+        # order; with `keep_sets` the NFA states behind each id are returned too.
+        alphabet = self.S - {EPSILON}
+        table = self.closure_table()
+        order = list(table)
+        for state in self.K:
+            if state not in table:
+                order.append(state)
+        bit = {state: 1 << position for position, state in enumerate(order)}
+
+        def mask_of(states: Iterable[STATE]) -> int:
+            mask = 0
+            for state in states:
+                mask |= bit[state]
+            return mask
+
+        # closed[symbol][position]: closure of the states reached from `position` on `symbol`
+        closed: dict[str, dict[int, int]] = {symbol: {} for symbol in alphabet}
+        for (state, symbol), targets in self.d.items():
+            if symbol != EPSILON:
+                mask = 0
+                for target in targets:
+                    mask |= mask_of(table.get(target, (target,)))
+                closed[symbol][bit[state].bit_length() - 1] = mask
+        # states with an outgoing transition on each symbol, to skip the others quickly
+        movers = {symbol: mask_of(order[position] for position in moves) for symbol, moves in closed.items()}
+        final_mask = mask_of(self.F)
+
+        initial = mask_of(table.get(self.q0, (self.q0,)))
+        ids = {initial: 0}
+        masks = [initial]
+        dfa_transitions: Dict[Tuple[int, str], int] = {}
+
+        for current, mask in enumerate(masks):
+            for symbol in alphabet:
+                moves = closed[symbol]
+                pending = mask & movers[symbol]
+                next_mask = 0
+                while pending:
+                    low = pending & -pending
+                    next_mask |= moves[low.bit_length() - 1]
+                    pending ^= low
+
+                target = ids.get(next_mask)
+                if target is None:
+                    target = ids[next_mask] = len(masks)
+                    masks.append(next_mask)
+                dfa_transitions[(current, symbol)] = target
+
+        sets = None
+        if keep_sets:
+            sets = []
+            for mask in masks:
+                members = []
+                while mask:
+                    low = mask & -mask
+                    members.append(order[low.bit_length() - 1])
+                    mask ^= low
+                sets.append(frozenset(members))
+
+        dfa = DFA(
+            S=alphabet,
+            K=set(range(len(masks))),
+            q0=0,
+            d=dfa_transitions,
+            F={current for current, mask in enumerate(masks) if mask & final_mask}
+        )
+        return dfa, sets
+
     def remap_states[OTHER_STATE](self, f: 'Callable[[STATE], OTHER_STATE]') -> 'NFA[OTHER_STATE]':
-        # optional, but may be useful for the second stage of the project. Works similarly to 'remap_states'
-        # from the DFA class. See the comments there for more details.
-        pass
+        # Rename every state through `f`, which should be one-to-one
+        names = {state: f(state) for state in self.K}
+        return NFA(
+            S=set(self.S),
+            K=set(names.values()),
+            q0=names[self.q0],
+            d={(names[state], symbol): {names[target] for target in targets} for (state, symbol), targets in self.d.items()},
+            F={names[state] for state in self.F}
+        )
+
+
+@dataclass
+class Arena:
+    # The edges of an NFA under construction, as parallel arrays: edge i goes from
+    # sources[i] to targets[i] on symbols[i]. Thompson's construction appends each
+    # node's own edges as it goes, so nothing is copied while the NFA grows; `view`
+    # turns the arena into an NFA once, at the end. States are numbered 0..states-1
+    # within the arena, which hands them out, and only moved to global ids by `view`.
+    sources: array = field(default_factory=lambda: array('q'))
+    symbols: list[str] = field(default_factory=list)
+    targets: array = field(default_factory=lambda: array('q'))
+    states: int = 0
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def new_states(self, n: int) -> int:
+        # First of `n` consecutive fresh states
+        first = self.states
+        self.states += n
+        return first
+
+    def new_state(self) -> int:
+        return self.new_states(1)
+
+    def add(self, source: int, symbol: str, target: int) -> None:
+        self.sources.append(source)
+        self.symbols.append(symbol)
+        self.targets.append(target)
+
+    def cut(self, start: int, offset: int) -> 'Arena':
+        # Copy of the edges from the `start`-th on, with every state moved by `offset`
+        return Arena(
+            array('q', [state + offset for state in self.sources[start:]]),
+            self.symbols[start:],
+            array('q', [state + offset for state in self.targets[start:]])
+        )
+
+    def paste(self, other: 'Arena', offset: int) -> None:
+        # Append the edges of `other`, with every state moved by `offset`
+        self.sources.extend([state + offset for state in other.sources])
+        self.symbols.extend(other.symbols)
+        self.targets.extend([state + offset for state in other.targets])
+
+    def view(self, q0: int, F: Iterable[int], offset: int = 0) -> NFA[int]:
+        # The NFA over the arena's states made of every edge, in one pass over the
+        # arrays, with every state moved by `offset`
+        d: dict[tuple[int, str], set[int]] = {}
+        for source, symbol, target in zip(self.sources, self.symbols, self.targets):
+            targets = d.get((source + offset, symbol))
+            if targets is None:
+                d[source + offset, symbol] = {target + offset}
+            else:
+                targets.add(target + offset)
+        S = set(self.symbols)
+        S.discard(EPSILON)
+        return NFA(
+            S=S,
+            K=set(range(offset, offset + self.states)),
+            q0=q0 + offset,
+            d=d,
+            F={state + offset for state in F}
+        )
@@ -1,191 +1,284 @@
-from typing import Set
-from dataclasses import dataclass
-from itertools import count
-from .NFA import NFA
+from collections.abc import Callable, Iterator
+from typing import FrozenSet
+from dataclasses import dataclass, fields
+from threading import Lock, RLock
+from weakref import WeakKeyDictionary, ref
+from .NFA import NFA, Arena
+
+# States are numbered globally, so NFAs built apart (even by different threads) can
+# be joined; a build numbers its states locally in its Arena and takes one block
+STATE_LOCK = Lock()
+NEXT_STATE = 0
+
+def new_states(n: int) -> int:
+    # First of `n` consecutive fresh states
+    global NEXT_STATE
+    with STATE_LOCK:
+        first = NEXT_STATE
+        NEXT_STATE += n
+    return first
 
-STATE_GEN = count()
 def new_state():
-    return next(STATE_GEN)
+    return new_states(1)
 
 EPSILON = ''
 
-@dataclass
+# Every live node, by its class and fields, a sub-expression standing for itself
+# (by id, as it was interned before its parent)
+INTERNED: dict[tuple, ref] = {}
+# Guards INTERNED, so two threads building the same node get the same object.
+# Reentrant, as a collection inside the guarded code can run `forget`.
+INTERN_LOCK = RLock()
+
+def forget(key: tuple, dead: ref) -> None:
+    # drop a node's entry once it is collected, unless a newer node took its place
+    with INTERN_LOCK:
+        if INTERNED.get(key) is dead:
+            del INTERNED[key]
+
+# Field names of each node class, in constructor order
+FIELDS: dict[type, tuple[str, ...]] = {}
+# Thompson sub-automaton of each node built more than once, as (edges, number of
+# states, start, end) over the states 0..n-1; None for the nodes built only once
+# so far
+TEMPLATES: WeakKeyDictionary = WeakKeyDictionary()
+
+@dataclass(frozen=True, eq=False)
 class Regex:
+    # Nodes are hash-consed: building a node with the same class and fields as a live
+    # one returns that one, so equal subtrees are a single object, even across rules,
+    # and identity is equality
+
+    def __new__(cls, *args, **kwargs):
+        if kwargs:
+            args += tuple(kwargs[name] for name in field_names(cls)[len(args):])
+        key = (cls, *[id(value) if isinstance(value, Regex) else value for value in args])
+        with INTERN_LOCK:
+            alive = INTERNED.get(key)
+            node = alive() if alive is not None else None
+            if node is None:
+                node = super().__new__(cls)
+                INTERNED[key] = ref(node, lambda dead: forget(key, dead))
+        return node
+
+    def __reduce__(self):
+        # rebuild through the constructor, so unpickled nodes are interned too
+        return type(self), tuple(getattr(self, name) for name in field_names(type(self)))
+
     def thompson(self) -> NFA[int]:
+        # A fresh NFA for this node, built bottom-up with an explicit stack so deep
+        # trees (e.g. long left-deep concatenations) do not recurse. Every node adds
+        # its own states and edges to one arena and hands its parent a fragment, the
+        # (start, end) pair of its sub-automaton, so building is linear in the size
+        # of the regex. A node asked for again (a subtree shared by several rules or
+        # places) keeps a template, and later uses paste it onto new states instead
+        # of rebuilding the subtree. Nodes under a subtree whose template is being
+        # recorded do not get their own, so the templates never hold more states
+        # than were built.
+        arena = Arena()
+        built: list[Fragment] = []
+        # (node, first state of its subtree, index of its first edge, whether its
+        # template is recorded), the first state being -1 until the node's children
+        # are pushed
+        stack = [(self, -1, 0, False)]
+        recording = 0
+        while stack:
+            node, first, edges, record = stack.pop()
+            if first < 0:
+                template = TEMPLATES.get(node)
+                if template is not None:
+                    edges, size, start, end = template
+                    first = arena.new_states(size)
+                    arena.paste(edges, first)
+                    built.append((start + first, end + first))
+                    continue
+                record = not recording and node in TEMPLATES
+                recording += record
+                stack.append((node, arena.states, len(arena), record))
+                stack.extend((child, -1, 0, False) for child in reversed(children(node)))
+                continue
+            arity = len(children(node))
+            fragment = node.construct(arena, *built[len(built) - arity:])
+            del built[len(built) - arity:]
+            if record:
+                # the subtree's states are exactly first..arena.states-1, and its
+                # edges the ones added since `edges`
+                size = arena.states - first
+                start, end = fragment
+                TEMPLATES[node] = (arena.cut(edges, -first), size, start - first, end - first)
+                recording -= 1
+            elif node not in TEMPLATES:
+                TEMPLATES[node] = None
+            built.append(fragment)
+        start, end = built[0]
+        return arena.view(start, {end}, new_states(arena.states))
+
+    def construct(self, arena: Arena, *parts: 'Fragment') -> 'Fragment':
+        # Thompson's construction for this node: add its own states and edges to
+        # `arena`, around its sub-expressions' fragments
         raise NotImplementedError
 
-@dataclass
+# The start and the only final state of a Thompson sub-automaton
+type Fragment = tuple[int, int]
+
+@dataclass(frozen=True, eq=False)
 class Literal(Regex):
     char: str
-    def thompson(self) -> NFA[int]:
-        start = new_state()
-        end = new_state()
-        transitions = {(start, self.char): {end}}
-        return NFA(
-            S={self.char},
-            K={start, end},
-            q0=start,
-            d=transitions,
-            F={end}
-        )
+    def construct(self, arena: Arena) -> Fragment:
+        start = arena.new_state()
+        end = arena.new_state()
+        arena.add(start, self.char, end)
+        return start, end
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Epsilon(Regex):
-    def thompson(self) -> NFA[int]:
-        start = new_state()
-        return NFA(
-            S=set(),
-            K={start},
-            q0=start,
-            d={},
-            F={start}
-        )
+    def construct(self, arena: Arena) -> Fragment:
+        start = arena.new_state()
+        return start, start
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Concatenation(Regex):
     left: Regex
     right: Regex
 
-    def thompson(self) -> NFA[int]:
-        # Generate NFAs for the sub-expressions
-        left_nfa = self.left.thompson()
-        right_nfa = self.right.thompson()
-
-        # Combine the state transitions from both NFAs
-        combined_transitions = left_nfa.d.copy()
-        for key, destinations in right_nfa.d.items():
-            if key in combined_transitions:
-                combined_transitions[key].update(destinations)
-            else:
-                combined_transitions[key] = destinations.copy()
-
-        # Link the final states of the left NFA to the initial state of the right NFA with epsilon transitions
-        for final_state in left_nfa.F:
-            epsilon_key = (final_state, EPSILON)
-            if epsilon_key not in combined_transitions:
-                combined_transitions[epsilon_key] = set()
-            combined_transitions[epsilon_key].add(right_nfa.q0)
-
-        # Define the combined state set and alphabet
-        all_states = left_nfa.S.union(right_nfa.S)
-        all_symbols = left_nfa.K.union(right_nfa.K)
-
-        # Construct the concatenated NFA
-        concatenated_nfa = NFA(
-            S=all_states,
-            K=all_symbols,
-            q0=left_nfa.q0,
-            d=combined_transitions,
-            F=right_nfa.F
-        )
-
-        return concatenated_nfa
+    def construct(self, arena: Arena, left: Fragment, right: Fragment) -> Fragment:
+        # Link the final state of the left NFA to the initial state of the right NFA with an epsilon transition
+        arena.add(left[1], EPSILON, right[0])
+        return left[0], right[1]
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Alternation(Regex):
     left: Regex
     right: Regex
 
-    def thompson(self) -> NFA[int]:
-        fresh_init = new_state()
-        fresh_final = new_state()
-
-        nfa_left = self.left.thompson()
-        nfa_right = self.right.thompson()
-
-        # Merge transitions
-        delta = dict(nfa_left.d)
-        delta.update(nfa_right.d)
+    def construct(self, arena: Arena, left: Fragment, right: Fragment) -> Fragment:
+        fresh_init = arena.new_state()
+        fresh_final = arena.new_state()
 
         # Epsilon transitions from fresh_init to both sub-NFAs' starts
-        delta[(fresh_init, EPSILON)] = {nfa_left.q0, nfa_right.q0}
+        arena.add(fresh_init, EPSILON, left[0])
+        arena.add(fresh_init, EPSILON, right[0])
 
-        # Link left sub-NFA final states to fresh_final
-        for end_state in nfa_left.F:
-            delta.setdefault((end_state, EPSILON), set()).add(fresh_final)
+        # Link both sub-NFAs' final states to fresh_final
+        arena.add(left[1], EPSILON, fresh_final)
+        arena.add(right[1], EPSILON, fresh_final)
+        return fresh_init, fresh_final
 
-        # Link right sub-NFA final states to fresh_final
-        for end_state in nfa_right.F:
-            delta.setdefault((end_state, EPSILON), set()).add(fresh_final)
-
-        # Construct the combined NFA
-        return NFA(
-            S=nfa_left.S.union(nfa_right.S),
-            K=nfa_left.K.union(nfa_right.K, {fresh_init, fresh_final}),
-            q0=fresh_init,
-            d=delta,
-            F={fresh_final}
-        )
-
-@dataclass
+@dataclass(frozen=True, eq=False)
 class KleeneStar(Regex):
     expr: Regex
 
-    def thompson(self) -> NFA[int]:
-        initial = new_state()
-        final = new_state()
-
-        sub_nfa = self.expr.thompson()
-
-        delta = dict(sub_nfa.d)
-        delta[(initial, EPSILON)] = {sub_nfa.q0, final}
-        for s in sub_nfa.F:
-            delta.setdefault((s, EPSILON), set()).update({sub_nfa.q0, final})
-
-        return NFA(
-            S=sub_nfa.S,
-            K=sub_nfa.K.union({initial, final}),
-            q0=initial,
-            d=delta,
-            F={final}
-        )
+    def construct(self, arena: Arena, sub: Fragment) -> Fragment:
+        initial = arena.new_state()
+        final = arena.new_state()
+
+        arena.add(initial, EPSILON, sub[0])
+        arena.add(initial, EPSILON, final)
+        arena.add(sub[1], EPSILON, sub[0])
+        arena.add(sub[1], EPSILON, final)
+        return initial, final
         
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Plus(Regex):
     expr: Regex
 
-    def thompson(self) -> NFA[int]:
-        sub_expr_nfa = self.expr.thompson()
-        init = new_state()
-        done = new_state()
-
-        edge_map = dict(sub_expr_nfa.d)
-        edge_map[(init, EPSILON)] = {sub_expr_nfa.q0}
-
-        for st in sub_expr_nfa.F:
-            edge_map.setdefault((st, EPSILON), set()).update({done, sub_expr_nfa.q0})
-
-        return NFA(
-            S=sub_expr_nfa.S,
-            K=sub_expr_nfa.K.union({init, done}),
-            q0=init,
-            d=edge_map,
-            F={done}
-        )
-@dataclass
+    def construct(self, arena: Arena, sub: Fragment) -> Fragment:
+        init = arena.new_state()
+        done = arena.new_state()
+
+        arena.add(init, EPSILON, sub[0])
+        arena.add(sub[1], EPSILON, done)
+        arena.add(sub[1], EPSILON, sub[0])
+        return init, done
+@dataclass(frozen=True, eq=False)
 class Question(Regex):
     expr: Regex
-    def thompson(self) -> NFA[int]:
+    def construct(self, arena: Arena, sub: Fragment) -> Fragment:
         # expr? = expr|epsilon
-        return Alternation(self.expr, Epsilon()).thompson()
+        return Alternation.construct(self, arena, sub, Epsilon.construct(self, arena))
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class CharacterClass(Regex):
-    chars: Set[str]
-    def thompson(self) -> NFA[int]:
-        start = new_state()
-        end = new_state()
-        transitions = {}
+    chars: FrozenSet[str]
+
+    def __new__(cls, chars):
+        return super().__new__(cls, frozenset(chars))
+
+    def __post_init__(self):
+        object.__setattr__(self, 'chars', frozenset(self.chars))
+
+    def construct(self, arena: Arena) -> Fragment:
+        start = arena.new_state()
+        end = arena.new_state()
         for c in self.chars:
-            transitions.setdefault((start, c), set()).add(end)
-        return NFA(
-            S=self.chars,
-            K={start, end},
-            q0=start,
-            d=transitions,
-            F={end}
-        )
+            arena.add(start, c, end)
+        return start, end
+
+
+def field_names(cls: type) -> tuple[str, ...]:
+    names = FIELDS.get(cls)
+    if names is None:
+        names = FIELDS[cls] = tuple(f.name for f in fields(cls))
+    return names
+
+
+def children(node: Regex) -> list[Regex]:
+    return [
+        value for name in field_names(type(node))
+        if isinstance(value := getattr(node, name), Regex)
+    ]
+
+
+def leaves(regex: Regex) -> Iterator[Regex]:
+    # Nodes without sub-expressions, walked with an explicit stack
+    stack = [regex]
+    while stack:
+        node = stack.pop()
+        below = children(node)
+        if below:
+            stack.extend(below)
+        else:
+            yield node
+
+
+def size(regex: Regex) -> int:
+    # Number of nodes of the syntax tree
+    count = 0
+    stack = [regex]
+    while stack:
+        count += 1
+        stack.extend(children(stack.pop()))
+    return count
+
+
+def transform_leaves(
+    regex: Regex,
+    f: Callable[[Regex], Regex],
+    memo: dict[Regex, Regex] | None = None
+) -> Regex:
+    # Copy of `regex` with every leaf replaced by f(leaf), built bottom-up
+    # with an explicit stack. A shared subtree is only copied once; pass the same
+    # `memo` to reuse the copies across several regexes.
+    if memo is None:
+        memo = {}
+    stack = [(regex, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node in memo:
+            continue
+        below = children(node)
+        if not below:
+            memo[node] = f(node)
+        elif not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(below))
+        else:
+            memo[node] = type(node)(*[
+                memo[value] if isinstance(value, Regex) else value
+                for value in (getattr(node, name) for name in field_names(type(node)))
+            ])
+    return memo[regex]
 
 
 # A small tokenizer for the regex
@@ -268,62 +361,51 @@ class Parser:
         return self.advance()
 
     def parse(self) -> Regex:
-        # parse regex
-        node = self.parse_union_expr()
-        if self.peek() is not None:
-            raise ValueError("Extra input after valid regex")
-        return node
-
-    def parse_union_expr(self) -> Regex:
-        node = self.parse_concat_expr()
-        while True:
-            tok = self.peek()
-            if tok and tok[0] == '|':
+        # parse regex, with an explicit stack of the groups still open instead of
+        # recursing, so deeply nested parentheses do not hit the recursion limit.
+        # Each group keeps, left-deep like the grammar below builds them:
+        #   union_expr  := concat_expr ('|' concat_expr)*
+        #   concat_expr := kleene_expr kleene_expr*
+        #   kleene_expr := basic_expr ('*' | '+' | '?')*
+        #   basic_expr  := LIT | CLASS | '(' union_expr ')'
+        # the alternation so far, the concatenation so far, and the last basic
+        # expression, which postfix operators still apply to
+        groups: list[Group] = [Group()]
+        while (tok := self.peek()) is not None:
+            group = groups[-1]
+            if tok[0] in ('LIT', 'CLASS'):
                 self.advance()
-                right = self.parse_concat_expr()
-                node = Alternation(node, right)
-            else:
-                break
-        return node
-
-    def parse_concat_expr(self) -> Regex:
-        node = self.parse_kleene_expr()
-        while True:
-            tok = self.peek()
-            # If next token is '|', it should be handled by union_expr, not here.
-            if tok and tok[0] == '|':
-                break
-            if tok and (tok[0] in ['LIT', 'CLASS', '(']):
-                right = self.parse_kleene_expr()
-                node = Concatenation(node, right)
-            else:
-                break
-        return node
-
-
-    def parse_kleene_expr(self) -> Regex:
-        node = self.parse_basic_expr()
-        while True:
-            tok = self.peek()
-            if tok and tok[0] in ['*', '+', '?']:
-                op = self.advance()
-                if op[0] == '*':
-                    node = KleeneStar(node)
-                elif op[0] == '+':
-                    node = Plus(node)
-                elif op[0] == '?':
-                    node = Question(node)
+                group.push(self.parse_basic_expr(tok))
+            elif tok[0] == '(':
+                self.advance()
+                groups.append(Group())
+            elif tok[0] in ('*', '+', '?'):
+                if group.last is None:
+                    raise ValueError(f"Unexpected token {tok}")
+                self.advance()
+                group.last = POSTFIX[tok[0]](group.last)
+            elif tok[0] == '|':
+                if group.last is None:
+                    raise ValueError(f"Unexpected token {tok}")
+                self.advance()
+                group.alternate()
+            elif group.last is None:
+                raise ValueError(f"Unexpected token {tok}")
+            elif len(groups) == 1:
+                # a ')' without its '('
+                raise ValueError("Extra input after valid regex")
             else:
-                break
-        return node
-
-    def parse_basic_expr(self) -> Regex:
-        tok = self.peek()
-        if not tok:
+                self.advance()
+                groups.pop()
+                groups[-1].push(group.close())
+        if groups[-1].last is None:
             raise ValueError("Unexpected end of input")
+        if len(groups) > 1:
+            self.expect(')', ')')
+        return groups[0].close()
 
+    def parse_basic_expr(self, tok) -> Regex:
         if tok[0] == 'LIT':
-            self.advance()
             val = tok[1]
             if val.startswith('\\') and val != '\\n':
                 # escaped literal
@@ -332,17 +414,33 @@ class Parser:
                 return Literal('\n')
             else:
                 return Literal(val)
-        elif tok[0] == 'CLASS':
-            self.advance()
-            return CharacterClass(tok[1])
-        elif tok[0] == '(':
-            # Parenthesized subexpression
-            self.advance()
-            node = self.parse_union_expr()
-            self.expect(')', ')')
-            return node
-        else:
-            raise ValueError(f"Unexpected token {tok}")
+        return CharacterClass(tok[1])
+
+
+POSTFIX: dict[str, Callable[[Regex], Regex]] = {'*': KleeneStar, '+': Plus, '?': Question}
+
+
+@dataclass
+class Group:
+    # A union_expr being parsed, see Parser.parse
+    union: Regex | None = None
+    concat: Regex | None = None
+    last: Regex | None = None
+
+    def push(self, node: Regex | None) -> None:
+        # a new basic expression: the previous one is done with postfix operators
+        if self.last is not None:
+            self.concat = self.last if self.concat is None else Concatenation(self.concat, self.last)
+        self.last = node
+
+    def alternate(self) -> None:
+        self.push(None)
+        self.union = self.concat if self.union is None else Alternation(self.union, self.concat)
+        self.concat = None
+
+    def close(self) -> Regex:
+        self.alternate()
+        return self.union
 
 def parse_regex(regex: str) -> Regex:
     tokens = tokenize(regex)
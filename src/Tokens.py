@@ -0,0 +1,208 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import accumulate, compress
+from typing import NamedTuple
+
+
+class LineIndex:
+    # Offsets where the lines of a text start, found in one pass with `find`, so that
+    # any offset resolves to its (line, column) by binary search. Both count from 0;
+    # for byte input the column is in bytes.
+
+    def __init__(self, text: str | bytes | bytearray | memoryview | object) -> None:
+        self.length = len(text)
+        self.starts = array('q', [0])
+        if isinstance(text, memoryview):
+            # no find on memoryview; re scans it in place
+            self.starts.extend(match.end() for match in re.finditer(b'\n', text))
+            return
+        newline = '\n' if isinstance(text, str) else b'\n'
+        find = text.find
+        i = find(newline)
+        while i >= 0:
+            self.starts.append(i + 1)
+            i = find(newline, i + 1)
+
+    def __len__(self) -> int:
+        # number of lines
+        return len(self.starts)
+
+    def position(self, offset: int) -> tuple[int, int]:
+        line = bisect_right(self.starts, offset) - 1
+        return line, offset - self.starts[line]
+
+
+class Offsets:
+    # Where each token of a text starts, offsets[0..n-1], and where the text ends,
+    # offsets[n] (also offsets[-1]): the cumulative lengths of the tokens, kept up to
+    # date across edits by Lexer.relex. They are held in blocks of at most BLOCK
+    # offsets relative to a base, so replacing a few tokens rebuilds the blocks
+    # around them and moves every later token by changing the later bases only.
+    BLOCK = 512
+
+    def __init__(self, lengths: Iterable[int] = ()) -> None:
+        self.blocks: list[array] = []
+        # offset and index of the first token of each block
+        self.bases: list[int] = []
+        self.firsts: list[int] = []
+        offsets = list(accumulate(lengths, initial=0))
+        self.fill(0, 0, 0, offsets)
+        self.count = len(offsets) - 1
+        self.end = offsets[-1]
+
+    def fill(self, at: int, base: int, first: int, offsets: list[int]) -> int:
+        # Cut `offsets`, the first `len(offsets) - 1` of them token starts and the last
+        # one where they end, into blocks inserted at block `at`; returns how many
+        starts = len(offsets) - 1
+        blocks = range(0, starts, self.BLOCK)
+        self.blocks[at:at] = [
+            array('q', [offset - offsets[k] for offset in offsets[k:min(k + self.BLOCK, starts)]]) for k in blocks
+        ]
+        self.bases[at:at] = [base + offsets[k] for k in blocks]
+        self.firsts[at:at] = [first + k for k in blocks]
+        return len(blocks)
+
+    def __len__(self) -> int:
+        return self.count + 1
+
+    def block(self, index: int) -> int:
+        # The block holding token `index` < count
+        return bisect_right(self.firsts, index) - 1
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self.count + 1
+        if index == self.count:
+            return self.end
+        j = self.block(index)
+        return self.bases[j] + self.blocks[j][index - self.firsts[j]]
+
+    def bisect(self, offset: int) -> int:
+        # bisect_left over the offsets: the first index whose offset is at least `offset`
+        j = bisect_left(self.bases, offset) - 1
+        if j < 0:
+            return 0 if self.blocks or offset <= self.end else 1
+        k = bisect_left(self.blocks[j], offset - self.bases[j])
+        if k < len(self.blocks[j]):
+            return self.firsts[j] + k
+        if j + 1 < len(self.blocks):
+            return self.firsts[j + 1]
+        return self.count if offset <= self.end else self.count + 1
+
+    def replace(self, first: int, stop: int, lengths: list[int]) -> None:
+        # Replace tokens first..stop-1 with tokens of the given lengths, moving the
+        # tokens from `stop` on (and the end) by the difference in total length
+        delta = sum(lengths) - (self[stop] - self[first])
+        shift = len(lengths) - (stop - first)
+        # the blocks holding tokens first..stop-1, or the last one when they are empty
+        low = self.block(first) if first < self.count else len(self.blocks) - 1
+        high = self.block(stop - 1) + 1 if stop > first else low + 1
+        low, high = max(low, 0), max(high, 0)
+        # small neighbours are rebuilt with them, so edits do not leave the blocks ever smaller
+        if low > 0 and len(self.blocks[low - 1]) < self.BLOCK // 2:
+            low -= 1
+        if high < len(self.blocks) and len(self.blocks[high]) < self.BLOCK // 2:
+            high += 1
+        head = self.firsts[low] if low < len(self.blocks) else 0
+        tail = self.firsts[high] if high < len(self.blocks) else self.count
+        # the offsets of those blocks, rebuilt around the new tokens
+        offsets = [self[index] for index in range(head, first + 1)]
+        offsets.extend(accumulate(lengths, initial=offsets.pop()))
+        offsets.extend(self[index] + delta for index in range(stop + 1, tail + 1))
+        del self.blocks[low:high], self.bases[low:high], self.firsts[low:high]
+        made = self.fill(low, 0, head, offsets)
+        for j in range(low + made, len(self.blocks)):
+            self.bases[j] += delta
+            self.firsts[j] += shift
+        self.count += shift
+        self.end += delta
+
+
+class Span(NamedTuple):
+    # A token as a [start, end) range of the buffer it was lexed from. The lexeme is
+    # only cut out (and decoded, for byte buffers) when it is asked for.
+    kind: str
+    start: int
+    end: int
+    buffer: object
+
+    @property
+    def lexeme(self) -> str:
+        text = self.buffer[self.start:self.end]
+        if isinstance(text, str):
+            return text
+        return bytes(text).decode('utf-8')
+
+    def pair(self) -> tuple[str, str]:
+        # The (token, lexeme) pair `Lexer.lex` returns
+        return self.kind, self.lexeme
+
+
+@dataclass
+class TokenBuffer:
+    # Tokens stored column by column: the index of each token's kind in `names`, and
+    # its start and length in `buffer`. No object is made per token until one is asked
+    # for. The columns are plain arrays, so they can also be handed to NumPy without
+    # a copy (numpy.frombuffer).
+    names: tuple[str, ...]
+    buffer: object
+    kinds: array = field(default_factory=lambda: array('i'))
+    starts: array = field(default_factory=lambda: array('q'))
+    lengths: array = field(default_factory=lambda: array('i'))
+    lines: LineIndex | None = field(default=None, repr=False, compare=False)
+
+    def append(self, kind: int, start: int, end: int) -> None:
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.lengths.append(end - start)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> tuple[str, str]:
+        return self.span(index).pair()
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        # The (token, lexeme) pairs of `Lexer.lex`, made one at a time
+        names, buffer = self.names, self.buffer
+        if isinstance(buffer, str):
+            for kind, start, length in zip(self.kinds, self.starts, self.lengths):
+                yield names[kind], buffer[start:start + length]
+        else:
+            for span in self.spans():
+                yield span.pair()
+
+    def span(self, index: int) -> Span:
+        start = self.starts[index]
+        return Span(self.names[self.kinds[index]], start, start + self.lengths[index], self.buffer)
+
+    def position(self, index: int) -> tuple[int, int]:
+        # (line, column) where token `index` starts; the line index is built on first use
+        if self.lines is None:
+            self.lines = LineIndex(self.buffer)
+        return self.lines.position(self.starts[index])
+
+    def spans(self) -> Iterator[Span]:
+        names, buffer = self.names, self.buffer
+        for kind, start, length in zip(self.kinds, self.starts, self.lengths):
+            yield Span(names[kind], start, start + length, buffer)
+
+    def select(self, *names: str) -> 'TokenBuffer':
+        # The tokens of the given kinds, over the same buffer. The kind column is
+        # mapped through a byte table, and the mask applied to each column at C speed.
+        table = bytes(name in names for name in self.names)
+        mask = bytes(map(table.__getitem__, self.kinds))
+        return TokenBuffer(
+            self.names,
+            self.buffer,
+            array(self.kinds.typecode, compress(self.kinds, mask)),
+            array(self.starts.typecode, compress(self.starts, mask)),
+            array(self.lengths.typecode, compress(self.lengths, mask)),
+            self.lines
+        )
+
+    def exclude(self, *names: str) -> 'TokenBuffer':
+        return self.select(*(name for name in self.names if name not in names))
@@ -0,0 +1,81 @@
+import json
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager
+
+
+class Tracer:
+    # Records how long each phase of building a lexer takes, as nested spans with the
+    # sizes of what the phase built (syntax tree nodes, NFA states and transitions,
+    # DFA states before and after minimization...). Pass one to Lexer(..., tracer=...);
+    # without one, the phases go through NULL_TRACER, which records nothing.
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        # name, start and duration in seconds from `origin`, and the sizes recorded
+        self.spans: list[dict] = []
+        self.depth = 0
+
+    @contextmanager
+    def span(self, name: str, **args: object) -> Iterator[dict]:
+        # Time the body of the with statement. It gets the span's `args` dict, to add
+        # the sizes it knows of once its work is done.
+        record = {'name': name, 'depth': self.depth, 'args': args}
+        self.spans.append(record)
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            self.depth -= 1
+            record['start'] = start - self.origin
+            record['duration'] = end - start
+
+    def totals(self) -> dict[str, float]:
+        # Seconds spent in each phase, over all rules
+        totals: dict[str, float] = {}
+        for record in self.spans:
+            totals[record['name']] = totals.get(record['name'], 0.0) + record['duration']
+        return totals
+
+    def chrome_trace(self) -> dict:
+        # The spans as complete events of the Chrome trace format, in microseconds,
+        # for chrome://tracing or Perfetto
+        pid = os.getpid()
+        return {
+            'traceEvents': [
+                {
+                    'name': record['name'],
+                    'cat': 'lexer',
+                    'ph': 'X',
+                    'ts': record['start'] * 1e6,
+                    'dur': record['duration'] * 1e6,
+                    'pid': pid,
+                    'tid': 0,
+                    'args': record['args'],
+                }
+                for record in self.spans
+            ]
+        }
+
+    def dump(self, path: str, kind: str = 'json') -> None:
+        # Write the spans as a JSON list ('json') or a Chrome trace ('chrome')
+        if kind not in ('json', 'chrome'):
+            raise ValueError(f"Unknown trace format {kind!r}, expected 'json' or 'chrome'")
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace() if kind == 'chrome' else self.spans, f, indent=1, default=str)
+
+
+class NullTracer:
+    # Stands in for a Tracer when there is none: every span is the same do-nothing
+    # context manager, whose body gets None instead of a dict to fill
+    disabled = nullcontext(None)
+
+    def span(self, name: str, **args: object) -> ContextManager[None]:
+        return self.disabled
+
+
+NULL_TRACER = NullTracer()
@@ -0,0 +1,45 @@
+import itertools
+import sys
+
+from src.DFA import DFA
+from src.Regex import Regex, parse_regex
+
+
+class ConstructionTests:
+    # Checks shared by the constructions that build an automaton straight from a regex,
+    # mixed into a unittest.TestCase. `automata` builds the automata of one regex, with
+    # the assertions of its own construction, and `build` the DFA of a regex.
+    regexes = [
+        "(ab|cd+|b*)?efg",
+        "(a|b)*c(a|b)*c(a|b)*",
+        "((a|b?)*c?)*",
+        "(a*b*)*|c+",
+        "a(b|c)(d|e)|abb|abc",
+        "[0-1]+((a|b)[0-1]+)*",
+        "[a-c]?([a-b]*[0-1])*",
+    ]
+
+    def automata(self, regex: str, ast: Regex, reference: DFA) -> list:
+        raise NotImplementedError
+
+    def build(self, ast: Regex, symbols: str) -> DFA:
+        raise NotImplementedError
+
+    def test_same_language_as_thompson(self):
+        # every word of up to 4 symbols is accepted as by the subset construction
+        for regex in self.regexes:
+            ast = parse_regex(regex)
+            reference = ast.thompson().subset_construction()
+            automata = self.automata(regex, ast, reference)
+            alphabet = sorted(reference.S)
+            for length in range(5):
+                for word in map(''.join, itertools.product(alphabet, repeat=length)):
+                    for automaton in automata:
+                        self.assertEqual(automaton.accept(word), reference.accept(word), (regex, word))
+
+    def test_deep_regex(self):
+        depth = 4 * sys.getrecursionlimit()
+        dfa = self.build(parse_regex("ab" * depth + "c?"), "abc")
+        self.assertTrue(dfa.accept("ab" * depth))
+        self.assertTrue(dfa.accept("ab" * depth + "c"))
+        self.assertFalse(dfa.accept("ab" * (depth - 1)))
@@ -0,0 +1,33 @@
+import unittest
+
+from src.Alphabet import partition
+from src.Lexer import Lexer
+from src.Regex import parse_regex
+
+
+class AlphabetTests(unittest.TestCase):
+    def test_partition(self):
+        alphabet = partition([parse_regex("if"), parse_regex("[a-z]+"), parse_regex("[0-9]+")])
+        self.assertCountEqual(
+            alphabet.classes,
+            [frozenset('i'), frozenset('f'), frozenset('abcdeghjklmnopqrstuvwxyz'), frozenset('0123456789')]
+        )
+        self.assertEqual(alphabet.representative['z'], 'a')
+        self.assertEqual(alphabet.representative['7'], '0')
+
+    def test_compress_preserves_language(self):
+        regexes = [parse_regex("[a-z_][a-z0-9_]*"), parse_regex("while"), parse_regex("[0-9]+")]
+        alphabet = partition(regexes)
+        for regex in regexes:
+            dfa = regex.thompson().subset_construction()
+            compressed = alphabet.compress(regex).thompson().subset_construction()
+            for word in ("while", "whale", "w_1", "_", "9x", "123", "a b"):
+                translated = ''.join(alphabet.representative.get(c, '#') for c in word)
+                self.assertEqual(compressed.accept(translated), dfa.accept(word), word)
+
+    def test_lexer_tables_use_classes(self):
+        lexer = Lexer([("IF", "if"), ("NAME", "[a-zA-Z0-9_]+"), ("SPACE", "\\ ")])
+        dfa = lexer.compiled.automata[0]
+        self.assertEqual(dfa.width, 4)
+        self.assertEqual(len(dfa.symbols), 64)
+        self.assertEqual(lexer.lex("if iff Z9"), [("IF", "if"), ("SPACE", " "), ("NAME", "iff"), ("SPACE", " "), ("NAME", "Z9")])
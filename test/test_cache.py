@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import Cache
+from src.Lexer import Lexer
+
+
+class CacheTests(unittest.TestCase):
+    spec = [("SPACE", "\\ "), ("IF", "if"), ("NAME", "[a-z]+"), ("NUMBER", "[0-9]+")]
+    word = "if iffy 12 x"
+
+    def setUp(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        self.directory = temporary.name
+
+    def test_warm_start_loads_the_cache(self):
+        expected = Lexer(self.spec).lex(self.word)
+        for mode in ('rules', 'combined', 'lazy'):
+            Lexer(self.spec, mode, cache_dir=self.directory)
+            with mock.patch('src.Lexer.compile_spec', side_effect=AssertionError("compiled again")):
+                lexer = Lexer(self.spec, mode, cache_dir=self.directory)
+            self.assertEqual(lexer.lex(self.word), expected)
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+
+    def test_key_depends_on_spec(self):
+        Lexer(self.spec, cache_dir=self.directory)
+        lexer = Lexer(self.spec[1:], cache_dir=self.directory)
+        self.assertEqual(lexer.lex("if"), [("IF", "if")])
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_key_depends_on_format(self):
+        Lexer(self.spec, cache_dir=self.directory)
+        with mock.patch('src.Cache.FORMAT', Cache.FORMAT + 1):
+            Lexer(self.spec, cache_dir=self.directory)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_corrupt_file_is_rebuilt(self):
+        Lexer(self.spec, cache_dir=self.directory)
+        [name] = os.listdir(self.directory)
+        path = os.path.join(self.directory, name)
+        with open(path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\0')
+        self.assertIsNone(Cache.load(self.directory, name.removesuffix('.pickle')))
+
+        lexer = Lexer(self.spec, cache_dir=self.directory)
+        self.assertEqual(lexer.lex(self.word), Lexer(self.spec).lex(self.word))
+        self.assertIsNotNone(Cache.load(self.directory, name.removesuffix('.pickle')))
+        self.assertEqual(os.listdir(self.directory), [name])
+
+    def test_environment_variable(self):
+        with mock.patch.dict(os.environ, {Cache.ENVIRONMENT: self.directory}):
+            Lexer(self.spec)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
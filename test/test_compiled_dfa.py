@@ -0,0 +1,123 @@
+import itertools
+import os
+import random
+import tempfile
+import unittest
+from array import array
+
+from src.DFA import DFA, CompiledDFA
+from src.Regex import parse_regex
+
+
+class CompiledDFATests(unittest.TestCase):
+    regexes = [
+        "a",
+        "(a|b)*abb",
+        "11*(00)*101(0|1)(0|1)*",
+        "(ab|ba)+c?",
+        "[a-c]*(a|b)",
+    ]
+
+    def words(self, alphabet: str, max_length: int = 6):
+        for length in range(max_length + 1):
+            for word in itertools.product(alphabet, repeat=length):
+                yield ''.join(word)
+
+    def test_accept_matches_dfa(self):
+        for regex in self.regexes:
+            dfa = parse_regex(regex).thompson().subset_construction()
+            compiled = dfa.compile()
+            alphabet = ''.join(sorted(dfa.S)) + 'z'
+            for word in self.words(alphabet, 5):
+                self.assertEqual(compiled.accept(word), dfa.accept(word), (regex, word))
+
+    def test_round_trip(self):
+        for regex in self.regexes:
+            dfa = parse_regex(regex).thompson().subset_construction()
+            self.assertEqual(dfa.compile().to_dfa(), dfa)
+
+    def classes(self, dfa: CompiledDFA) -> int:
+        # Number of Myhill-Nerode classes by naive refinement, missing transitions
+        # counting as a jump to a rejecting sink
+        width = len(dfa.symbols)
+        block = list(dfa.tags)
+        while True:
+            signatures = {}
+            for state in range(len(block)):
+                row = dfa.table[state * width:(state + 1) * width]
+                signature = (block[state], *(block[t] if t >= 0 else None for t in row))
+                signatures.setdefault(signature, len(signatures))
+            refined = [
+                signatures[(block[s], *(block[t] if t >= 0 else None for t in dfa.table[s * width:(s + 1) * width]))]
+                for s in range(len(block))
+            ]
+            if len(set(refined)) == len(set(block)):
+                return len(set(refined))
+            block = refined
+
+    def random_dfa(self, rng: random.Random, n: int, width: int, partial: bool) -> CompiledDFA:
+        low = -1 if partial else 0
+        table = array('i', (rng.randint(low, n - 1) for _ in range(n * width)))
+        tags = array('i', (rng.choice((-1, -1, 0, 1)) for _ in range(n)))
+        symbols = {chr(ord('a') + column): column for column in range(width)}
+        return CompiledDFA(symbols, table, 0, tags, tuple(range(n)))
+
+    def test_minimize(self):
+        for regex in self.regexes:
+            dfa = parse_regex(regex).thompson().subset_construction()
+            compiled = dfa.compile()
+            minimal = compiled.minimize()
+            self.assertEqual(len(minimal.states), self.classes(compiled), regex)
+            for word in self.words(''.join(sorted(dfa.S)), 6):
+                self.assertEqual(minimal.accept(word), compiled.accept(word), (regex, word))
+
+    def test_minimize_random(self):
+        rng = random.Random(4)
+        for trial in range(200):
+            partial = trial % 2 == 1
+            dfa = self.random_dfa(rng, rng.randint(1, 30), rng.randint(1, 3), partial)
+            minimal = dfa.minimize()
+            if partial:
+                # a dead state may also absorb the missing transitions
+                self.assertLessEqual(len(minimal.states), self.classes(dfa))
+            else:
+                self.assertEqual(len(minimal.states), self.classes(dfa))
+            for word in self.words(''.join(dfa.symbols), 5):
+                self.assertEqual(minimal.accept(word), dfa.accept(word))
+                self.assertEqual(self.tag_of(minimal, word), self.tag_of(dfa, word))
+
+    def tag_of(self, dfa: CompiledDFA, word: str) -> int:
+        state = dfa.q0
+        for char in word:
+            state = dfa.table[state * len(dfa.symbols) + dfa.symbols[char]]
+            if state < 0:
+                return -1
+        return dfa.tags[state]
+
+    def test_trim_removes_sink(self):
+        dfa = parse_regex("ab").thompson().subset_construction()
+        trimmed = dfa.compile().trim()
+        self.assertNotIn(frozenset(), trimmed.states)
+        self.assertTrue(trimmed.accept("ab"))
+        self.assertFalse(trimmed.accept("aa"))
+
+    def test_lookahead(self):
+        cases = [("ab", 0), ("a|abcd", 2), ("a(bc)*d", None), ("a|a(bc)*d", None), ("(ab)*", 1)]
+        for regex, expected in cases:
+            dfa = parse_regex(regex).thompson().subset_construction()
+            self.assertEqual(dfa.compile().minimize().trim().lookahead(), expected, regex)
+
+    def test_load_dump(self):
+        dfa = DFA.load('./tests_2/2.txt')
+        self.assertIn(' ', dfa.S)
+        self.assertTrue(dfa.accept("ab cd"))
+        self.assertFalse(dfa.accept("ab cd "))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dfa.txt')
+            minimal = dfa.minimize()
+            minimal.remap_states(lambda state: f"q{state}").dump(path)
+            loaded = CompiledDFA.load(path)
+        self.assertEqual(len(loaded.tags), len(minimal.K))
+        self.assertEqual(set(loaded.symbols), dfa.S)
+        for word in ["", "a", "ab cd", "x\ny", "a  b", " "]:
+            self.assertEqual(loaded.accept(word), dfa.accept(word), word)
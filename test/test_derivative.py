@@ -0,0 +1,47 @@
+import random
+import unittest
+
+from src.Derivative import EMPTY, DerivativeDFA, Derivatives, derivative_dfa
+from src.Regex import Epsilon, parse_regex
+from test.constructions import ConstructionTests
+
+
+class DerivativeTests(ConstructionTests, unittest.TestCase):
+    def test_normal_form(self):
+        derivatives = Derivatives()
+        normalize = derivatives.normalize
+        self.assertIs(normalize(parse_regex("(ab|c)|d")), normalize(parse_regex("d|(c|ab)")))
+        self.assertIs(normalize(parse_regex("ab|ab|ab")), normalize(parse_regex("ab")))
+        self.assertIs(normalize(parse_regex("(ab)c")), normalize(parse_regex("a(bc)")))
+        self.assertIs(normalize(parse_regex("a|[bc]|c")), normalize(parse_regex("[a-c]")))
+        self.assertIs(normalize(parse_regex("(a*)*")), normalize(parse_regex("a*")))
+        self.assertIs(derivatives.derivative(normalize(parse_regex("ab")), 'b'), EMPTY)
+        self.assertIs(derivatives.derivative(normalize(parse_regex("a")), 'a'), Epsilon())
+
+    def automata(self, regex, ast, reference):
+        dfa, tags = derivative_dfa([ast], reference.S)
+        self.assertEqual(set(tags.values()), {0})
+        # near-minimal: never more states than the subset construction
+        self.assertLessEqual(len(dfa.K), len(reference.K), regex)
+        return [dfa, DerivativeDFA([ast], max_states=3)]
+
+    def build(self, ast, symbols):
+        return derivative_dfa([ast], symbols)[0]
+
+    def test_combined_tags(self):
+        dfa, tags = derivative_dfa([parse_regex("if"), parse_regex("[a-z]+")], "fiz")
+        state = dfa.q0
+        for char, tag in zip("ifz", (1, 0, 1)):
+            state = dfa.d[state, char]
+            self.assertEqual(tags[state], tag)
+
+    def test_flush_bounds_memo(self):
+        lazy = DerivativeDFA([parse_regex("(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)")], max_states=16)
+        word = ''.join(random.Random(0).choices("ab", k=20000))
+        self.assertEqual(lazy.accept(word), word[-9] == "a")
+        self.assertGreater(lazy.flushes, 0)
+        self.assertLess(len(lazy.derivatives.derivatives), 16 * 2 * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
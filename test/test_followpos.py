@@ -0,0 +1,30 @@
+import unittest
+
+from src.Followpos import followpos_dfa
+from src.Regex import parse_regex
+from test.constructions import ConstructionTests
+
+
+class FollowposTests(ConstructionTests, unittest.TestCase):
+    def automata(self, regex, ast, reference):
+        dfa, tags = followpos_dfa([ast], reference.S)
+        minimal = dfa.minimize()
+        self.assertEqual(set(tags.values()), {0})
+        # no sink state, so at most one state less once both are minimal
+        self.assertIn(len(reference.minimize().K) - len(minimal.K), (0, 1), regex)
+        return [dfa, minimal]
+
+    def build(self, ast, symbols):
+        return followpos_dfa([ast], symbols)[0]
+
+    def test_end_markers_tag_rules(self):
+        dfa, tags = followpos_dfa([parse_regex("if"), parse_regex("[a-z]+"), parse_regex("i?")], "fiz")
+        self.assertEqual(tags[dfa.q0], 2)
+        state = dfa.q0
+        for char, tag in zip("ifz", (1, 0, 1)):
+            state = dfa.d[state, char]
+            self.assertEqual(tags[state], tag)
+
+
+if __name__ == '__main__':
+    unittest.main()
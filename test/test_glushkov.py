@@ -0,0 +1,33 @@
+import unittest
+
+from src.Glushkov import glushkov
+from src.NFA import EPSILON
+from src.Regex import parse_regex
+from test.constructions import ConstructionTests
+
+
+class GlushkovTests(ConstructionTests, unittest.TestCase):
+    def automata(self, regex, ast, reference):
+        return [self.build(ast, reference.S)]
+
+    def build(self, ast, symbols):
+        return glushkov(ast).subset_construction()
+
+    def test_one_state_per_position(self):
+        nfa = glushkov(parse_regex("(a|[0-9])*a?b"))
+        self.assertEqual(len(nfa.K), 5)
+        self.assertFalse(any(symbol == EPSILON for _, symbol in nfa.d))
+        self.assertNotIn(nfa.q0, nfa.F)
+        star = glushkov(parse_regex("a*"))
+        self.assertIn(star.q0, star.F)
+
+    def test_shared_subtrees_get_their_own_positions(self):
+        nfa = glushkov(parse_regex("(ab)(ab)"))
+        self.assertEqual(len(nfa.K), 5)
+        dfa = nfa.subset_construction()
+        self.assertTrue(dfa.accept("abab"))
+        self.assertFalse(dfa.accept("ab"))
+
+
+if __name__ == '__main__':
+    unittest.main()
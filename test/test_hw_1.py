@@ -120,53 +120,11 @@ class HW1Tests(unittest.TestCase):
                 for j in range(len(x[i])):
                     result += str(x[i][j])
             return result
-        with open(test_file_name, 'w') as f:
-            f.write(dfa.remap_states(transform).__str__())
+        dfa.remap_states(transform).dump(test_file_name)
 
             
     def fromFile(self, file_name: str) -> DFA:
-        with open(file_name, 'r') as f:
-            states = set()
-            line = f.readline().strip()
-            if line != '#states':
-                raise ValueError('invalid file format')
-            while True:
-                line = f.readline().strip()
-                if line == '#initial':
-                    break
-                states.add(line)
-                
-            states = set(map(lambda x: frozenset([x]), states))
-            initial = f.readline().strip()
-            initial = frozenset([initial])
-            accepting = set()
-            f.readline()
-            while True:
-                line = f.readline().strip()
-                if line == '#alphabet':
-                    break
-                accepting.add(line)
-                
-            accepting = set(map(lambda x: frozenset([x]), accepting))
-            alphabet = set()
-            while True:
-                line = f.readline().strip()
-                if line == '#transitions':
-                    break
-                alphabet.add(line)
-                
-            transitions = {}
-            while True:
-                line = f.readline().strip()
-                if line == '':
-                    break
-                sc,d = line.split('>')
-                s, c = sc.split(':')
-                s = frozenset([s])
-                d = frozenset([d])
-                transitions[(s, c)] = d
-                
-            return DFA(alphabet, states, initial, transitions, accepting)
+        return DFA.load(file_name)
         
     def apply_test(self, nfa: NFA, file_name: str, points: int) -> None:
         dfa = nfa.subset_construction()
@@ -31,64 +31,10 @@ class HW2Tests(unittest.TestCase):
                 for j in range(len(x[i])):
                     result += str(x[i][j])
             return result
-        with open(test_file_name, 'w') as f:
-            f.write(dfa.remap_states(transform).__str__())
+        dfa.remap_states(transform).dump(test_file_name)
             
     def fromFile(self, file_name: str) -> DFA:
-        with open(file_name, 'r') as f:
-            states = set()
-            line = f.readline().strip()
-            if line != '#states':
-                raise ValueError('invalid file format')
-            while True:
-                line = f.readline().strip()
-                #print(line)
-                if line == '#initial':
-                    break
-                states.add(line)
-                
-            states = set(map(lambda x: frozenset([x]), states))
-            #print(f'states: {states}')
-            initial = f.readline().strip()
-            initial = frozenset([initial])
-            accepting = set()
-            f.readline()
-            while True:
-                line = f.readline().strip()
-                if line == '#alphabet':
-                    break
-                accepting.add(line)
-                
-            accepting = set(map(lambda x: frozenset([x]), accepting))
-            #print(f'accepting: {accepting}')
-            alphabet = set()
-            while True:
-                line = f.readline()
-                if line == '#transitions' or line == '#transitions\n':
-                    break
-                alphabet.add(line[:-1] if line[:-1] not in ['\\n', '\\t', '\\\\'] else '\n' if line[:-1] == '\\n' else '\t' if line[:-1] == '\\t' else ' ')
-                #print(f'line: {line[:-1]}')
-                #print(f'alphabet: {alphabet}')
-                
-            #print(f'alphabet: {alphabet}')
-            transitions = {}
-            while True:
-                line = f.readline().strip()
-                if line == '':
-                    break
-                sc,d = line.split('>')
-                # see if sc end in a symbol that is in the alphabet
-                c = None
-                for i in range(len(sc) - 1, -1, -1):
-                    if sc[i] in alphabet:
-                        c = sc[i]
-                        break
-                s = sc[:i]
-                s = frozenset([s])
-                d = frozenset([d])
-                transitions[(s, c)] = d
-                
-            return DFA(alphabet, states, initial, transitions, accepting)
+        return DFA.load(file_name)
         
     def equivalent(self, dfa1: DFA, dfa2: DFA) -> bool:
         if dfa1.S != dfa2.S:
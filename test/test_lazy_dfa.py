@@ -0,0 +1,29 @@
+import unittest
+
+from src.LazyDFA import LazyDFA
+from src.Lexer import Lexer
+from src.Regex import parse_regex
+
+
+class LazyDFATests(unittest.TestCase):
+    def test_accept_matches_dfa(self):
+        regex = "(a|b)*a(a|b)(a|b)(a|b)"
+        nfa = parse_regex(regex).thompson()
+        dfa = nfa.subset_construction()
+        lazy = LazyDFA(nfa, max_states=4)
+        for word in ("abab", "aaaa", "babbb", "bbbabbbbbaab", "abc", ""):
+            self.assertEqual(lazy.accept(word), dfa.accept(word), word)
+        self.assertGreater(lazy.flushes, 0)
+        self.assertLessEqual(len(lazy.sets), 4)
+
+    def test_cache_counters(self):
+        lazy = LazyDFA(parse_regex("ab*").thompson())
+        lazy.accept("abbbb")
+        self.assertEqual((lazy.misses, lazy.hits, lazy.flushes), (3, 2, 0))
+
+    def test_lexer_lazy_mode(self):
+        spec = [("ones", "11+"), ("pair", "01|10"), ("other", "0|1"), ("SPACE", "\\ ")]
+        word = "1011011 10101 1001"
+        reference = Lexer(spec).lex(word)
+        for max_states in (3, 5, 4096):
+            self.assertEqual(Lexer(spec, 'lazy', max_states).lex(word), reference)
@@ -0,0 +1,193 @@
+import io
+import os
+import tempfile
+import unittest
+
+from src.Lexer import Lexer
+from src.Tokens import LineIndex, Offsets
+
+
+class LexerTests(unittest.TestCase):
+    spec = [
+        ("SPACE", "\\ "),
+        ("NEWLINE", "\n"),
+        ("IF", "if"),
+        ("NAME", "[a-z]+"),
+        ("NUMBER", "[0-9]+"),
+        ("FLOAT", "[0-9]+.[0-9]+"),
+    ]
+    words = [
+        "if iffy 12 3.5\nx",
+        "if if if",
+        "a 0.1 22",
+        "1.",
+    ]
+
+    def test_modes_agree(self):
+        lexers = [Lexer(self.spec, mode) for mode in ('rules', 'combined')]
+        for word in self.words:
+            self.assertEqual(lexers[0].lex(word), lexers[1].lex(word), word)
+
+    def test_spec_order_breaks_ties(self):
+        lexer = Lexer(self.spec)
+        self.assertEqual(lexer.lex("if iff"), [("IF", "if"), ("SPACE", " "), ("NAME", "iff")])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Lexer(self.spec, 'fastest')
+        with self.assertRaises(ValueError):
+            Lexer(self.spec, construction='fastest')
+
+    def test_constructions_agree(self):
+        for mode in ('rules', 'combined', 'lazy'):
+            thompson = Lexer(self.spec, mode)
+            for construction in ('glushkov', 'derivative', 'followpos'):
+                lexer = Lexer(self.spec, mode, construction=construction)
+                for word in self.words + ["if\n?"]:
+                    self.assertEqual(lexer.lex(word), thompson.lex(word), (mode, construction, word))
+
+    def test_stream_matches_lex(self):
+        word = "if iffy 12 3.5\nx 100.25 if\n" * 3
+        for mode in ('rules', 'combined', 'lazy'):
+            lexer = Lexer(self.spec, mode)
+            expected = lexer.lex(word)
+            for size in (1, 2, 3, 7, 64):
+                chunks = [word[k:k + size] for k in range(0, len(word), size)]
+                self.assertEqual(list(lexer.lex_stream(chunks)), expected, (mode, size))
+            self.assertEqual(list(lexer.lex_stream(io.StringIO(word), chunk_size=5)), expected)
+
+    def test_stream_error(self):
+        lexer = Lexer(self.spec)
+        [(_, message)] = lexer.lex("if 1.x")
+        self.assertEqual(message, "No viable alternative at character 4, line 0")
+        tokens = []
+        with self.assertRaisesRegex(ValueError, message):
+            for token in lexer.lex_stream(["if 1", ".x"]):
+                tokens.append(token)
+        self.assertEqual(tokens, [("IF", "if"), ("SPACE", " "), ("NUMBER", "1")])
+        word = "if\n 1.5\nx 1."
+        [(_, message)] = lexer.lex(word)
+        self.assertEqual(message, "No viable alternative at character 3, line 2")
+        for size in (1, 2, 5):
+            chunks = [word[k:k + size] for k in range(0, len(word), size)]
+            with self.assertRaisesRegex(ValueError, message):
+                list(lexer.lex_stream(chunks))
+
+    def test_lex_file(self):
+        spec = [("WORD", "[a-zé→]+"), ("SPACE", "\\ |\n"), ("ARROW", "→")]
+        text = "if é→x\nplain ascii →\n"
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "input.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            for mode in ('rules', 'combined'):
+                lexer = Lexer(spec, mode)
+                spans = lexer.lex_file(path)
+                self.assertEqual([span.pair() for span in spans], lexer.lex(text))
+                self.assertEqual(spans[2].start, 3)
+                self.assertEqual(spans[2].end - spans[2].start, 6)
+            # the column counts characters, not bytes, before the error
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("ok\né→ 1")
+            self.assertEqual(lexer.lex_file(path), lexer.lex("ok\né→ 1"))
+            self.assertEqual(lexer.lex_file(path), [("", "No viable alternative at character 3, line 1")])
+
+    def test_parallel_matches_lex(self):
+        word = "if iffy 12 3.5\nx 100.25 if\n" * 200
+        for mode in ('combined', 'lazy'):
+            lexer = Lexer(self.spec, mode)
+            self.assertEqual(lexer.lex_parallel(word, workers=2, chunk_size=97), lexer.lex(word))
+        lexer = Lexer(self.spec)
+        broken = word[:3000] + "1.x" + word
+        self.assertEqual(lexer.lex_parallel(broken, workers=2, chunk_size=97), lexer.lex(broken))
+
+    def test_relex(self):
+        lexer = Lexer(self.spec)
+        old = "if iffy 12 3.5\nx " * 50
+        tokens = lexer.lex(old)
+        edits = [(3, 3, "zz"), (9, 10, ""), (10, 10, ".25"), (0, 2, "1"), (len(old), len(old), "if"), (14, 17, "")]
+        for start, end, text in edits:
+            new = old[:start] + text + old[end:]
+            result = lexer.relex(tokens, start, end, new)
+            self.assertEqual(result.tokens, lexer.lex(new), (start, end, text))
+            self.assertLess(result.removed + result.inserted, 10)
+            self.assertEqual(result.tokens[:result.first], tokens[:result.first])
+        # "3.5" is one token, so the edit after "3." reaches back to its start
+        result = lexer.relex(tokens, 13, 14, "if iffy 12 3.x\nx " + old[17:])
+        self.assertEqual(result, [("", "No viable alternative at character 12, line 0")])
+        result = lexer.relex(tokens, 13, 14, "if iffy 12 3.7\nx " + old[17:])
+        self.assertEqual((result.first, result.removed, result.inserted), (6, 1, 1))
+        # in 'rules' mode the Y automaton reads "xyyyy" from the start of X without
+        # ever accepting, so the edit at the end still reaches back to it
+        spec = [("X", "x"), ("Y", "xyyyyz"), ("YC", "y"), ("W", "w"), ("Z", "z")]
+        for mode in ('rules', 'combined'):
+            lexer = Lexer(spec, mode)
+            result = lexer.relex(lexer.lex("xyyyyw"), 5, 6, "xyyyyz")
+            self.assertEqual(result.tokens, [("Y", "xyyyyz")], mode)
+
+    def test_relex_in_place(self):
+        # an editor keeps the tokens and their offsets between edits, and relex updates both
+        lexer = Lexer(self.spec)
+        text = "if iffy 12 3.5\nx " * 400
+        tokens = lexer.lex(text)
+        offsets = Offsets(len(lexeme) for _, lexeme in tokens)
+        edits = [(3, 3, "zz"), (9, 10, ""), (4000, 4003, "1.2 x"), (0, 2, "1"), (len(text) - 3, len(text), "if")]
+        for start, end, inserted in edits:
+            text = text[:start] + inserted + text[end:]
+            result = lexer.relex(tokens, start, end, text, offsets)
+            self.assertIs(result.tokens, tokens)
+            self.assertEqual(tokens, lexer.lex(text), (start, end, inserted))
+            self.assertEqual(offsets[-1], len(text))
+            self.assertEqual(offsets[result.first + result.inserted], len("".join(lexeme for _, lexeme in tokens[:result.first + result.inserted])))
+
+    def test_relex_unbounded_lookahead(self):
+        # a string scan can read any number of characters past a lone quote
+        spec = [("STRING", '"[a-z ]*"'), ("QUOTE", '"'), ("NAME", "[a-z]+"), ("SPACE", "\\ ")]
+        old = "ab cd " * 100 + '"ab cd ef'
+        for mode in ('rules', 'combined', 'lazy'):
+            lexer = Lexer(spec, mode)
+            self.assertIsNone(lexer.lookahead)
+            tokens = lexer.lex(old)
+            result = lexer.relex(tokens, len(old), len(old), old + '"')
+            self.assertEqual(result.tokens, lexer.lex(old + '"'), mode)
+            self.assertEqual(result.first, 400, mode)
+            # an edit before the quote only reaches back to its own token
+            new = old[:301] + "x" + old[302:]
+            result = lexer.relex(tokens, 301, 302, new)
+            self.assertEqual(result.tokens, lexer.lex(new), mode)
+            self.assertEqual(result.first, 200, mode)
+
+    def test_token_buffer(self):
+        lexer = Lexer(self.spec)
+        word = "if iffy 12 3.5\nx"
+        tokens = lexer.lex_buffer(word)
+        self.assertEqual(list(tokens), lexer.lex(word))
+        self.assertEqual(len(tokens), 9)
+        self.assertEqual(tokens[6], ("FLOAT", "3.5"))
+        self.assertEqual(list(tokens.select("NAME", "IF")), [("IF", "if"), ("NAME", "iffy"), ("NAME", "x")])
+        self.assertEqual(len(tokens.exclude("SPACE", "NEWLINE")), 5)
+        self.assertEqual(lexer.lex_buffer("1.x"), [("", "No viable alternative at character 1, line 0")])
+        self.assertEqual(tokens.position(8), (1, 0))
+
+    def test_line_index(self):
+        text = "ab\n\ncd\n"
+        for buffer in (text, text.encode(), memoryview(text.encode())):
+            lines = LineIndex(buffer)
+            self.assertEqual(len(lines), 4)
+            positions = [lines.position(offset) for offset in range(len(text) + 1)]
+            self.assertEqual(positions, [(0, 0), (0, 1), (0, 2), (1, 0), (2, 0), (2, 1), (2, 2), (3, 0)])
+
+    def test_spans(self):
+        spec = [("WORD", "[a-zé→]+"), ("SPACE", "\\ |\n"), ("ARROW", "→")]
+        text = "if é→x\nplain ascii →\n"
+        data = text.encode('utf-8')
+        lexer = Lexer(spec)
+        expected = lexer.lex(text)
+        for buffer in (text, data, bytearray(data), memoryview(data)):
+            spans = lexer.spans(buffer)
+            self.assertEqual([span.pair() for span in spans], expected, type(buffer))
+            self.assertIs(spans[0].buffer, buffer)
+            self.assertEqual(list(lexer.lex_buffer(buffer)), expected)
+        self.assertEqual(lexer.spans(b"if\n 1"), [("", "No viable alternative at character 1, line 1")])
+        for buffer in ("if\n é 1", "if\n é 1".encode(), memoryview("if\n é 1".encode())):
+            self.assertEqual(lexer.spans(buffer), [("", "No viable alternative at character 3, line 1")])
@@ -0,0 +1,73 @@
+import unittest
+
+from src.NFA import Arena, NFA, EPSILON
+from src.Regex import parse_regex
+
+
+class NFATests(unittest.TestCase):
+    def cyclic_nfa(self) -> NFA[int]:
+        # 0 -> 1 -> 2 -> 0 is an epsilon cycle, 2 -> 3 leaves it, 4 is only reached on 'a'
+        return NFA(
+            S={'a'},
+            K={0, 1, 2, 3, 4},
+            q0=0,
+            d={
+                (0, EPSILON): {1},
+                (1, EPSILON): {2},
+                (2, EPSILON): {0, 3},
+                (3, 'a'): {4},
+            },
+            F={4}
+        )
+
+    def naive_closure(self, nfa: NFA, state) -> set:
+        closure, stack = {state}, [state]
+        while stack:
+            for target in nfa.d.get((stack.pop(), EPSILON), ()):
+                if target not in closure:
+                    closure.add(target)
+                    stack.append(target)
+        return closure
+
+    def test_closure_of_cycle(self):
+        nfa = self.cyclic_nfa()
+        for state in (0, 1, 2):
+            self.assertEqual(nfa.epsilon_closure(state), {0, 1, 2, 3})
+        self.assertEqual(nfa.epsilon_closure(3), {3})
+        self.assertEqual(nfa.closure_of_set({3, 4}), frozenset({3, 4}))
+
+    def test_matches_traversal(self):
+        for regex in ("((a|b?)*c?)*", "(a*b*)*|c+", "((ab)?(c|d)*)+"):
+            nfa = parse_regex(regex).thompson()
+            for state in nfa.K:
+                self.assertEqual(nfa.epsilon_closure(state), self.naive_closure(nfa, state), regex)
+            self.assertEqual(
+                nfa.closure_of_set(nfa.K),
+                frozenset().union(*(self.naive_closure(nfa, state) for state in nfa.K))
+            )
+
+    def test_bitset_construction(self):
+        for regex in ("((a|b?)*c?)*", "(ab|ba)+c?", "11*(00)*101(0|1)(0|1)*"):
+            nfa = parse_regex(regex).thompson()
+            reference = nfa.subset_construction()
+            dfa, sets = nfa.subset_construction_bitset(keep_sets=True)
+            self.assertEqual(dfa.K, set(range(len(reference.K))))
+            self.assertEqual(set(sets), reference.K)
+            self.assertEqual(sets[dfa.q0], reference.q0)
+            for (state, symbol), target in dfa.d.items():
+                self.assertEqual(reference.d[sets[state], symbol], sets[target])
+            self.assertEqual({sets[state] for state in dfa.F}, reference.F)
+
+    def test_arena(self):
+        arena = Arena()
+        self.assertEqual(arena.new_states(3), 0)
+        arena.add(0, 'a', 1)
+        arena.add(1, EPSILON, 2)
+        arena.add(1, EPSILON, 0)
+        copy = arena.cut(1, 10)
+        self.assertEqual(list(copy.sources), [11, 11])
+        arena.paste(copy, arena.new_state() - 11)
+        nfa = arena.view(0, {2}, 100)
+        self.assertEqual(nfa.S, {'a'})
+        self.assertEqual((nfa.K, nfa.q0, nfa.F), ({100, 101, 102, 103}, 100, {102}))
+        self.assertEqual(nfa.d, {(100, 'a'): {101}, (101, EPSILON): {100, 102}, (103, EPSILON): {102, 104}})
@@ -0,0 +1,85 @@
+import pickle
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from src.Regex import CharacterClass, Concatenation, Literal, parse_regex
+
+
+class RegexTests(unittest.TestCase):
+    def test_equal_subtrees_are_shared(self):
+        first = parse_regex("ab(c|d)*")
+        second = parse_regex("x(c|d)*")
+        self.assertIs(first.right, second.right)
+        self.assertIs(Concatenation(Literal('a'), Literal('b')), parse_regex("ab"))
+        self.assertIs(CharacterClass({'a', 'b'}), CharacterClass(frozenset('ba')))
+        self.assertIsNot(parse_regex("ab"), parse_regex("ba"))
+
+    def test_pickle_keeps_sharing(self):
+        regex = parse_regex("[a-z]+(\\.[a-z]+)?")
+        self.assertIs(pickle.loads(pickle.dumps(regex)), regex)
+
+    def test_shared_subtree_builds_disjoint_nfas(self):
+        regex = parse_regex("(ab|c)*d")
+        nfas = [parse_regex("(ab|c)*d").thompson() for _ in range(3)]
+        for nfa in nfas:
+            dfa = nfa.subset_construction()
+            self.assertTrue(dfa.accept("abcd"))
+            self.assertFalse(dfa.accept("abc"))
+            self.assertEqual(len(nfa.K), len(nfas[0].K))
+        self.assertFalse(nfas[0].K & nfas[1].K)
+        self.assertFalse(nfas[1].K & nfas[2].K)
+        self.assertTrue(regex.thompson().subset_construction().accept("d"))
+
+    def test_threads_build_disjoint_nfas(self):
+        regex = parse_regex("(ab|c)*d([0-9]|e)+")
+        size = len(regex.thompson().K)
+        # switch threads as often as possible, so builds interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(8) as pool:
+                nfas = list(pool.map(lambda _: regex.thompson(), range(200)))
+                # threads parsing a fresh pattern at once intern one tree
+                for k in range(50):
+                    pattern = f"(xy|z)*w([1-9]|v)+{k}" * 20
+                    barrier = Barrier(8)
+                    def parse(_):
+                        barrier.wait()
+                        return parse_regex(pattern)
+                    self.assertEqual(len(set(pool.map(parse, range(8)))), 1)
+        finally:
+            sys.setswitchinterval(interval)
+        states = set()
+        for nfa in nfas:
+            self.assertEqual(nfa.K, set(range(min(nfa.K), min(nfa.K) + size)))
+            self.assertFalse(states & nfa.K)
+            states |= nfa.K
+
+    def test_deep_regexes_do_not_recurse(self):
+        depth = 4 * sys.getrecursionlimit()
+        dfa = parse_regex("ab" * depth).thompson().subset_construction()
+        self.assertTrue(dfa.accept("ab" * depth))
+        self.assertFalse(dfa.accept("ab" * (depth - 1)))
+        nested = parse_regex("(" * depth + "a|b" + ")*" * depth)
+        self.assertTrue(nested.thompson().subset_construction().accept("abba"))
+        keywords = parse_regex("|".join(f"k{i}" for i in range(depth)))
+        self.assertIs(keywords.right, parse_regex(f"k{depth - 1}"))
+        self.assertEqual(len(keywords.thompson().F), 1)
+
+    def test_syntax_errors(self):
+        for regex, message in [
+            ("", "Unexpected end of input"),
+            ("a(", "Unexpected end of input"),
+            ("a(b", "Expected ) ), got None"),
+            ("()", "Unexpected token"),
+            ("a|*", "Unexpected token"),
+            ("a)b", "Extra input after valid regex"),
+        ]:
+            with self.assertRaisesRegex(ValueError, message.replace("(", "\\(").replace(")", "\\)"), msg=regex):
+                parse_regex(regex)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.Lexer import Lexer
+from src.Trace import Tracer
+
+
+class TraceTests(unittest.TestCase):
+    spec = [("SPACE", "\\ "), ("IF", "if"), ("NAME", "[a-z]+"), ("NUMBER", "[0-9]+")]
+
+    def test_phases(self):
+        for mode, phases in (
+            ('combined', {'compile', 'parse_regex', 'partition', 'thompson', 'subset_construction', 'minimize'}),
+            ('rules', {'compile', 'parse_regex', 'partition', 'thompson', 'subset_construction', 'minimize'}),
+            ('lazy', {'compile', 'parse_regex', 'partition', 'thompson', 'lazy_dfa'}),
+        ):
+            tracer = Tracer()
+            lexer = Lexer(self.spec, mode, tracer=tracer)
+            self.assertEqual(set(tracer.totals()), phases, mode)
+            self.assertEqual(lexer.lex("if x1"), Lexer(self.spec).lex("if x1"))
+
+        tracer = Tracer()
+        Lexer(self.spec, 'rules', tracer=tracer)
+        parses = [span for span in tracer.spans if span['name'] == 'parse_regex']
+        self.assertEqual([span['args']['rule'] for span in parses], ["SPACE", "IF", "NAME", "NUMBER"])
+        self.assertEqual(parses[1]['args']['ast_nodes'], 3)
+        minimized = [span['args'] for span in tracer.spans if span['name'] == 'minimize']
+        self.assertEqual(len(minimized), 4)
+        self.assertTrue(all(args['states_after'] <= args['states_before'] for args in minimized))
+        compile_span = tracer.spans[0]
+        self.assertEqual((compile_span['name'], compile_span['depth']), ('compile', 0))
+        self.assertTrue(all(span['depth'] == 1 for span in tracer.spans[1:]))
+
+    def test_cache_spans_nest_under_compile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for names in (['compile', 'cache_load', 'cache_store'], ['compile', 'cache_load']):
+                tracer = Tracer()
+                Lexer(self.spec, cache_dir=directory, tracer=tracer)
+                spans = [span for span in tracer.spans if span['name'] in names]
+                self.assertEqual([span['name'] for span in spans], names)
+                self.assertEqual([span['depth'] for span in spans], [0] + [1] * (len(names) - 1))
+
+    def test_export(self):
+        tracer = Tracer()
+        Lexer(self.spec, tracer=tracer)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.json')
+            tracer.dump(path, 'chrome')
+            with open(path) as f:
+                events = json.load(f)['traceEvents']
+            tracer.dump(path)
+            with open(path) as f:
+                spans = json.load(f)
+        self.assertEqual(len(events), len(spans))
+        self.assertTrue(all(event['ph'] == 'X' and event['dur'] >= 0 for event in events))
+        with self.assertRaises(ValueError):
+            tracer.dump(path, 'xml')